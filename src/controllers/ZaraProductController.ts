@@ -5,7 +5,9 @@ import ZaraProduct, {
   Size,
 } from "../infrastructure/interfaces/zaraProduct/ZaraProduct";
 import { ZaraProductRepo } from "../infrastructure/interfaces/zaraProduct/ZaraProductRepo";
-import ScriptManagerImpl from "../infrastructure/ScriptManagerImpl";
+import ScriptManagerImpl, {
+  ScriptRecord
+} from "../infrastructure/ScriptManagerImpl";
 import { sendTelegramAlert } from "../services/telegramBotService";
 import { StockState } from "../enums/StockState";
 
@@ -21,6 +23,9 @@ interface ZaraController {
 export default class ZaraProductControllerImpl implements ZaraController {
   private manager = new ScriptManagerImpl();
   private zaraProductRepo: ZaraProductRepo;
+  // Schedules whose stored product has no pending restock confirmations. Only
+  // these can ask the scraper to answer "unchanged" instead of a full product.
+  private settledSchedules = new Set<string>();
 
   constructor(zaraProductRepo: ZaraProductRepo) {
     this.zaraProductRepo = zaraProductRepo;
@@ -32,16 +37,60 @@ export default class ZaraProductControllerImpl implements ZaraController {
     scheduleId: string,
     url: string
   ): Promise<void> {
-    let results = await this.manager.runScript(fileName, [url]);
-    if (!results) {
+    const args = [url, "--cache-key", scheduleId];
+    if (this.settledSchedules.has(scheduleId)) {
+      args.push("--if-changed");
+    }
+    this.settledSchedules.delete(scheduleId);
+
+    let failure: Error | null = null;
+    let received = 0;
+    await this.manager.streamScript(
+      fileName,
+      args,
+      async (record: ScriptRecord) => {
+        if (record.type === "end") {
+          return;
+        }
+        received++;
+        try {
+          await this.handleRecord(record, userId, scheduleId, url);
+        } catch (error: any) {
+          failure = error;
+        }
+      }
+    );
+    if (failure) {
+      throw failure;
+    }
+    if (!received) {
       console.log("Failed to get script results");
       throw new Error(
         "ZaraProduct controller error: Failed to get script results"
       );
     }
+  }
+
+  private async handleRecord(
+    record: ScriptRecord,
+    userId: string,
+    scheduleId: string,
+    url: string
+  ): Promise<void> {
+    if (record.type === "error") {
+      throw new Error(
+        `ZaraProduct controller error: scraper returned ${record.status} (${
+          record.kind ?? "error"
+        }): ${record.error}`
+      );
+    }
+    if (record.type === "unchanged") {
+      this.settledSchedules.add(scheduleId);
+      return;
+    }
 
     try {
-      const data = JSON.parse(results);
+      const data = record.product;
       const arrivingProduct = this.buildZaraProduct(
         data,
         userId,
@@ -63,6 +112,7 @@ export default class ZaraProductControllerImpl implements ZaraController {
           );
 
           await this.zaraProductRepo.addOrUpdateZaraProduct(updatedProduct);
+          this.markSettled(scheduleId, updatedProduct);
           if (notifications.length > 0) {
             const result = await sendTelegramAlert(
               userId,
@@ -71,9 +121,12 @@ export default class ZaraProductControllerImpl implements ZaraController {
             console.log("notifications", notifications);
             console.log("Success:", result);
           }
+        } else {
+          this.markSettled(scheduleId, existingProduct);
         }
       } else {
         await this.zaraProductRepo.addOrUpdateZaraProduct(arrivingProduct);
+        this.markSettled(scheduleId, arrivingProduct);
       }
     } catch (error: any) {
       console.error("Error executing transaction:", error.message);
@@ -81,6 +134,15 @@ export default class ZaraProductControllerImpl implements ZaraController {
     }
   }
 
+  private markSettled(scheduleId: string, product: ZaraProduct): void {
+    const pendingRestock = product.colors.some((color) =>
+      color.sizes.some((size) => size.restockConfirmationCount > 0)
+    );
+    if (!pendingRestock) {
+      this.settledSchedules.add(scheduleId);
+    }
+  }
+
   private updateExistingProduct(
     existingProduct: ZaraProduct,
     arrivingProduct: ZaraProduct
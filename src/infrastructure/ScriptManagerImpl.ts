@@ -1,9 +1,35 @@
 import { PythonShell, Options } from "python-shell";
 
+// One line of the scrapers' `--ndjson` output, see src/scrapper/protocol.py
+export interface ScriptRecord {
+  v: number;
+  type: "product" | "delta" | "unchanged" | "error" | "end";
+  status: number;
+  ok: boolean;
+  id?: string | number | null;
+  url?: string | null;
+  product?: any;
+  delta?: any;
+  kind?: string | null;
+  error?: string;
+  count?: number;
+  failed?: number;
+}
+
 interface ScriptManager {
   runScript(scriptFileName: string, args?: string[]): Promise<string>;
+  streamScript(
+    scriptFileName: string,
+    args: string[],
+    onRecord: (record: ScriptRecord) => Promise<void> | void
+  ): Promise<boolean>;
 }
 
+// The scrapers stop retrying at SCRAPER_DEADLINE; this is the backstop for a
+// process that hangs anyway, so it cannot hold a cron slot forever.
+const SCRIPT_TIMEOUT_MS =
+  Number(process.env.SCRAPER_SCRIPT_TIMEOUT_SECONDS ?? "90") * 1000;
+
 class ScriptManagerImpl implements ScriptManager {
   private options: Options = {
     mode: "text",
@@ -18,14 +44,100 @@ class ScriptManagerImpl implements ScriptManager {
     const optionsWithArgs: Options = { ...this.options, args };
 
     return new Promise<string>((resolve, reject) => {
-      PythonShell.run(scriptFileName, optionsWithArgs)
-        .then((results: any) => {
-          resolve(results);
-        })
-        .catch((err: any) => {
+      const shell = new PythonShell(scriptFileName, optionsWithArgs);
+      const results: string[] = [];
+      let timedOut = false;
+      const timer = setTimeout(() => {
+        timedOut = true;
+        shell.kill("SIGKILL");
+      }, SCRIPT_TIMEOUT_MS);
+
+      shell.on("message", (message: string) => {
+        results.push(message);
+      });
+      shell.end((err: any) => {
+        clearTimeout(timer);
+        if (timedOut) {
+          const error = new Error(
+            `Python script ${scriptFileName} timed out after ${SCRIPT_TIMEOUT_MS} ms`
+          );
+          console.error("Error running Python script:", error);
+          reject(error);
+        } else if (err) {
           console.error("Error running Python script:", err);
           reject(err);
+        } else {
+          resolve(results as any);
+        }
+      });
+    });
+  }
+
+  // Runs a scraper with `--ndjson` and hands each record to `onRecord` as soon
+  // as its line arrives, one at a time and in order. Lines that are not JSON are
+  // logged and skipped, and a failing handler only loses its own record. The
+  // scraper's stderr is forwarded to the console. Resolves true when the
+  // scraper's end frame was received.
+  public async streamScript(
+    scriptFileName: string,
+    args: string[],
+    onRecord: (record: ScriptRecord) => Promise<void> | void
+  ): Promise<boolean> {
+    const optionsWithArgs: Options = {
+      ...this.options,
+      args: [...args, "--ndjson"]
+    };
+
+    return new Promise<boolean>((resolve, reject) => {
+      const shell = new PythonShell(scriptFileName, optionsWithArgs);
+      let handled: Promise<void> = Promise.resolve();
+      let complete = false;
+      let timedOut = false;
+      const timer = setTimeout(() => {
+        timedOut = true;
+        shell.kill("SIGKILL");
+      }, SCRIPT_TIMEOUT_MS);
+
+      shell.on("message", (line: string) => {
+        let record: ScriptRecord;
+        try {
+          record = JSON.parse(line);
+        } catch (error) {
+          console.error(`Skipping malformed line from ${scriptFileName}:`, line);
+          return;
+        }
+        if (record.type === "end") {
+          complete = true;
+        }
+        handled = handled
+          .then(() => onRecord(record))
+          .catch((error) =>
+            console.error(
+              `Error handling ${record.type} record from ${scriptFileName}:`,
+              error
+            )
+          );
+      });
+      shell.on("stderr", (line: string) => {
+        console.error(`[${scriptFileName}] ${line}`);
+      });
+      shell.end((err: any) => {
+        clearTimeout(timer);
+        handled.then(() => {
+          if (timedOut) {
+            const error = new Error(
+              `Python script ${scriptFileName} timed out after ${SCRIPT_TIMEOUT_MS} ms`
+            );
+            console.error("Error running Python script:", error);
+            reject(error);
+          } else if (err) {
+            console.error("Error running Python script:", err);
+            reject(err);
+          } else {
+            resolve(complete);
+          }
         });
+      });
     });
   }
 }
@@ -0,0 +1,354 @@
+from datetime import datetime
+from urllib.parse import urljoin
+import asyncio
+import json
+import os
+import ssl
+import sys
+import time
+
+from batch import host_of
+from pageCache import UNCHANGED
+from protocol import error_record, failure_record, result_record, end_record
+from rateLimiter import rate_limiter, classify_status, CHALLENGE, THROTTLED, ERROR
+from retryPolicy import Deadline, DeadlineExceeded, ChallengeFailed, retry_delay, GET_TIMEOUT, VERIFY_TIMEOUT, MAX_ATTEMPTS
+from worker import job_options, write_result
+from zaraEngine import (HEADERS, SEC_PATH, LambdaTransport,
+                        clearance_cache, page_cache, snapshot_store, transport_from_config)
+from challengeSolver import scan
+from historyStore import history_store, HISTORY
+from parsePipeline import ParsePool, parse_product_page, PARSE_PROCESSES
+
+try:
+    import certifi
+    import httpx
+except ImportError:
+    httpx = None
+
+CONCURRENCY = int(os.environ.get("SCRAPER_ASYNC_CONCURRENCY", "1000"))
+CONNECTIONS = int(os.environ.get("SCRAPER_ASYNC_CONNECTIONS", "200"))
+# connections per httpx client; a route needing more gets several clients
+SHARD_CONNECTIONS = 10
+
+# asyncio version of the zaraEngine pipeline for high-fanout monitoring. One
+# event loop holds every in-flight scrape (initial GET, verify POST, final GET)
+# on pooled httpx.AsyncClient connections (SCRAPER_ASYNC_CONNECTIONS per route),
+# so a scrape waiting on a slow proxy costs a coroutine instead of an OS thread.
+# SCRAPER_ASYNC_CONCURRENCY caps the scrapes in flight. Page parsing is CPU-bound
+# and runs on the parsePipeline pool (SCRAPER_PARSE_PROCESSES, 0 parses inline).
+# Route choice, proxy health, rate limiting, clearance cookies, the page cache
+# and the retry policy are the ones the threaded engine uses; only one scrape
+# per route answers a challenge at a time, the rest reuse its clearance.
+#
+#   python3 asyncEngine.py <file>     one worker job (URL or JSON) per line, - for stdin
+#
+# prints one protocol record per line as scrapes finish, then the end frame.
+# Scrapes are not traced (SCRAPER_TRACE follows threads, not tasks).
+
+
+def timeout_for(deadline, phase, phase_timeout):
+    connect, read = deadline.timeout(phase, phase_timeout)
+    return httpx.Timeout(read, connect=connect)
+
+
+def cookie_header(cookies):
+    return {'Cookie': '; '.join(f'{name}={value}' for name, value in cookies.items())} if cookies else {}
+
+
+class Shard:
+    # one httpx client, and a gate that keeps its requests within its pool
+    def __init__(self, route, connections, ssl_context):
+        limits = httpx.Limits(max_connections=connections, max_keepalive_connections=connections)
+        self.client = httpx.AsyncClient(proxy=route, limits=limits, verify=ssl_context)
+        self.gate = asyncio.Semaphore(connections)
+        self.in_flight = 0
+
+
+class AsyncZaraEngine:
+    def __init__(self, transport=None, concurrency=None, parse_processes=None):
+        if httpx is None:
+            raise RuntimeError("the async engine needs httpx, pip install httpx")
+        self.transport = transport or transport_from_config("direct")
+        if isinstance(self.transport, LambdaTransport):
+            raise ValueError("the async engine fetches pages itself, use the direct or proxy transport")
+        self.concurrency = concurrency or CONCURRENCY
+        self.semaphore = asyncio.Semaphore(self.concurrency)
+        parse_processes = PARSE_PROCESSES if parse_processes is None else parse_processes
+        self.parse_pool = ParsePool(parse_processes) if parse_processes > 0 else None
+        self.clients = {}
+        # loading the CA bundle takes ~35ms, so every client shares one context
+        self.ssl_context = ssl.create_default_context(cafile=certifi.where())
+        # route -> Event set when the scrape verifying that route is done
+        self.solving = {}
+        # rate limit key -> Lock new scrapes queue on, see admit()
+        self.admission = {}
+
+    def shards(self, route):
+        key = route or "direct"
+        shards = self.clients.get(key)
+        if shards is None:
+            count = -(-CONNECTIONS // SHARD_CONNECTIONS)
+            shards = [Shard(route, -(-CONNECTIONS // count), self.ssl_context) for _ in range(count)]
+            self.clients[key] = shards
+        return shards
+
+    async def request(self, route, method, url, deadline, phase, phase_timeout, **kwargs):
+        # The client with the most free connections takes the request. Waiting
+        # for a connection happens on its semaphore, never inside httpcore, whose
+        # pool rescans every queued request whenever a connection frees up. The
+        # timeout is taken once a connection is free, so the wait counts against
+        # the deadline but not against the phase timeout.
+        shard = min(self.shards(route), key=lambda shard: shard.in_flight)
+        shard.in_flight += 1
+        try:
+            async with shard.gate:
+                return await shard.client.request(method, url, timeout=timeout_for(deadline, phase, phase_timeout), **kwargs)
+        finally:
+            shard.in_flight -= 1
+
+    async def close(self):
+        for shards in self.clients.values():
+            for shard in shards:
+                await shard.client.aclose()
+        self.clients.clear()
+        if self.parse_pool is not None:
+            self.parse_pool.close()
+
+    async def wait_for_token(self, limit_key, deadline):
+        # a token that would only come after the deadline is not taken
+        delay = rate_limiter.reserve(limit_key, max(deadline.remaining(), 0))
+        if delay is None:
+            raise DeadlineExceeded("rate limit")
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    async def admit(self, limit_key):
+        # New scrapes on a route queue here in order and take the token of
+        # their first request only once one is free, never borrowing ahead:
+        # running scrapes get their next tokens first, and a scrape's deadline
+        # starts when it is admitted rather than when it was queued
+        async with self.admission.setdefault(limit_key, asyncio.Lock()):
+            while True:
+                delay = rate_limiter.admit(limit_key)
+                if not delay:
+                    return
+                await asyncio.sleep(delay)
+
+    async def wait_for_clearance(self, solving, deadline):
+        try:
+            await asyncio.wait_for(solving.wait(), max(deadline.remaining(), 0))
+        except asyncio.TimeoutError:
+            raise DeadlineExceeded("clearance")
+
+    async def fetch_product_page(self, url, route=None, conditional=None, deadline=None, admitted=False):
+        # `admitted`: admit() already took the token of the initial GET
+        deadline = deadline or Deadline()
+        key = route or "direct"
+        solving = self.solving.get(key)
+        if solving is not None:
+            # another scrape is verifying this route, its clearance spares this
+            # one the challenge
+            await self.wait_for_clearance(solving, deadline)
+        sent = clearance_cache.get(key) or {}
+        headers = {**HEADERS, **conditional} if conditional else HEADERS
+
+        limit_key = (host_of(url), key)
+        if not admitted:
+            await self.wait_for_token(limit_key, deadline)
+        start = time.monotonic()
+        try:
+            r = await self.request(route, "GET", url, deadline, "initial GET", GET_TIMEOUT, headers={**headers, **cookie_header(sent)})
+            r.raise_for_status()
+        except httpx.HTTPError as e:
+            self.transport.record_error(route, e, time.monotonic() - start)
+            response = getattr(e, "response", None)
+            rate_limiter.record(limit_key, classify_status(response.status_code) if response is not None else ERROR)
+            raise
+        latency = time.monotonic() - start
+        challenge = scan(r.content)
+        challenged = challenge is not None
+        self.transport.record_success(route, latency, challenged=challenged)
+        rate_limiter.record(limit_key, CHALLENGE if challenged else classify_status(r.status_code))
+
+        if not challenged:
+            return r
+
+        if sent and clearance_cache.get(key) == sent:
+            # challenged again, the cached clearance is no longer honoured
+            clearance_cache.invalidate(key)
+            for shard in self.shards(route):
+                shard.client.cookies.clear()
+        try:
+            solving = self.solving.get(key)
+            if solving is None:
+                cookies = await self.verify(url, route, r, challenge, deadline)
+            else:
+                # a scrape that hit the same challenge is verifying already
+                await self.wait_for_clearance(solving, deadline)
+                cookies = clearance_cache.get(key)
+                if not cookies:
+                    raise ChallengeFailed(url)
+            await self.wait_for_token(limit_key, deadline)
+            rrr = await self.request(route, "GET", url, deadline, "final GET", GET_TIMEOUT, headers={**headers, **cookie_header(cookies)})
+            rrr.raise_for_status()
+        except httpx.HTTPError as e:
+            self.transport.record_error(route, e)
+            response = getattr(e, "response", None)
+            rate_limiter.record(limit_key, classify_status(response.status_code) if response is not None else ERROR)
+            raise
+        if scan(rrr.content) is not None:
+            # verified and still challenged: this route is blocked
+            clearance_cache.invalidate(key)
+            rate_limiter.record(limit_key, THROTTLED)
+            raise ChallengeFailed(url)
+        return rrr
+
+    async def verify(self, url, route, r, challenge, deadline):
+        # Answers the challenge in `r` and returns the cookies for the final GET.
+        # One scrape per route verifies at a time, the others wait for its clearance.
+        key = route or "direct"
+        solving = self.solving[key] = asyncio.Event()
+        try:
+            payload = challenge.payload()
+            # cookies are sent per scrape, so concurrent scrapes on one client do
+            # not pick up each other's half-finished challenge
+            cookies = dict(r.cookies)
+            rr = await self.request(route, "POST", urljoin(url, SEC_PATH), deadline, "verify POST", VERIFY_TIMEOUT,
+                                    json=payload, headers={**HEADERS, **cookie_header(cookies)})
+            rr.raise_for_status()
+            clearance_cache.put(key, r.cookies.jar, rr.cookies.jar)
+            cookies.update(rr.cookies)
+            return cookies
+        finally:
+            del self.solving[key]
+            solving.set()
+
+    async def parse(self, html, created, digest):
+        # the page cache checks stay in this process, the parse workers only parse
+        if self.parse_pool is None:
+            return parse_product_page(html, created, digest)
+        # pages go through the pool's shared-memory slots; with every slot taken
+        # the handoff waits on a thread so the loop keeps fetching
+        loop = asyncio.get_running_loop()
+        future = await loop.run_in_executor(None, self.parse_pool.submit, html, created, digest)
+        result, _, _ = await asyncio.wrap_future(future)
+        return result
+
+    async def attempt(self, url, route, admitted, tried, created, deadline, cache_key, if_changed, delta, known_digest):
+        # the first attempt goes out through the route it was admitted on, a
+        # retry through a route this scrape has not used yet. The page cache,
+        # snapshot and history stores are SQLite and files: they run on
+        # threads, never on the loop
+        if not admitted:
+            route = self.transport.acquire(exclude=tried)
+        tried.add(route)
+        conditional = await asyncio.to_thread(page_cache.conditional_headers, cache_key, url) if if_changed else None
+        response = await self.fetch_product_page(url, route, conditional, deadline, admitted)
+        if response.status_code == 304:
+            return UNCHANGED
+        product, digest = await self.parse(response.content, created, cache_key is not None)
+        if HISTORY:
+            await asyncio.to_thread(history_store.record, url, product.to_dict())
+        if digest is not None:
+            if if_changed and await asyncio.to_thread(page_cache.is_unchanged, cache_key, url, digest):
+                return UNCHANGED
+            await asyncio.to_thread(page_cache.store, cache_key, url, response.headers, digest)
+        if delta:
+            return await asyncio.to_thread(snapshot_store.delta, cache_key or url, product.to_dict(), known_digest)
+        return product
+
+    async def extract_product_info(self, url, cache_key=None, if_changed=False, delta=False, known_digest=None):
+        # raises like the threaded engine does with raise_errors=True
+        created = datetime.utcnow().isoformat()
+        tried = set()
+        number = 0
+        async with self.semaphore:
+            route = self.transport.acquire()
+            await self.admit((host_of(url), route or "direct"))
+            deadline = Deadline()
+            admitted = True
+            while True:
+                try:
+                    return await self.attempt(url, route, admitted, tried, created, deadline, cache_key, if_changed,
+                                              delta, known_digest)
+                except Exception as e:
+                    number += 1
+                    admitted = False
+                    await asyncio.sleep(retry_delay(e, number, deadline, MAX_ATTEMPTS))
+
+    async def scrape(self, url, job_id=None, **options):
+        if not url:
+            return error_record(job_id, url, 400, "url is required")
+        if not isinstance(url, str):
+            return error_record(job_id, None, 400, f"Invalid job: url must be a string, got {type(url).__name__}")
+        try:
+            result = await self.extract_product_info(url, **options)
+        except Exception as e:
+            return failure_record(job_id, url, e)
+        return result_record(job_id, url, result, options.get("delta", False))
+
+    async def run_jobs(self, jobs, stdout=None):
+        # Writes a record per job as it finishes, never holding more jobs in
+        # memory than the concurrency limit
+        stdout = stdout or sys.stdout
+        count = failed = 0
+        pending = set()
+
+        def write(record):
+            nonlocal count, failed
+            write_result(stdout, record)
+            count += 1
+            failed += not record["ok"]
+
+        async def drain(return_when):
+            nonlocal pending
+            done, pending = await asyncio.wait(pending, return_when=return_when)
+            for task in done:
+                write(task.result())
+
+        for job in jobs:
+            if job.get("type") == "error":
+                # read_jobs passes unreadable lines through as error records
+                write(job)
+                continue
+            pending.add(asyncio.ensure_future(self.scrape(job.get("url"), job.get("id"), **job_options(job))))
+            if len(pending) >= self.concurrency:
+                await drain(asyncio.FIRST_COMPLETED)
+        if pending:
+            await drain(asyncio.ALL_COMPLETED)
+        write_result(stdout, end_record(count, failed))
+
+
+def read_jobs(lines):
+    for line in lines:
+        line = line.strip()
+        if not line or line.startswith("#"):
+            continue
+        if line.startswith(("{", '"')):
+            try:
+                job = json.loads(line)
+            except json.JSONDecodeError as e:
+                yield error_record(None, None, 400, f"Invalid job: {e}")
+                continue
+        else:
+            job = line
+        yield {"url": job} if isinstance(job, str) else job
+
+
+async def main(path):
+    engine = AsyncZaraEngine()
+    try:
+        if path == "-":
+            await engine.run_jobs(read_jobs(sys.stdin))
+        else:
+            with open(path, encoding="utf-8") as f:
+                await engine.run_jobs(read_jobs(f))
+    finally:
+        await engine.close()
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 2:
+        print("Usage: python asyncEngine.py <URL file | ->", file=sys.stderr)
+        sys.exit(1)
+    asyncio.run(main(sys.argv[1]))
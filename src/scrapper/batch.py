@@ -0,0 +1,47 @@
+from collections import defaultdict, deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from urllib.parse import urlsplit
+import os
+
+MAX_WORKERS = int(os.environ.get("SCRAPER_MAX_WORKERS", "8"))
+PER_HOST = int(os.environ.get("SCRAPER_PER_HOST", "4"))
+
+
+def host_of(url):
+    return urlsplit(url).netloc.lower() if url else ""
+
+
+def run_batch(urls, extract, max_workers=None, per_host=None):
+    # Yields (url, result) pairs as soon as each scrape finishes, never running more
+    # than `max_workers` scrapes overall or `per_host` scrapes against one host.
+    max_workers = max_workers or MAX_WORKERS
+    per_host = per_host or PER_HOST
+
+    pending = defaultdict(deque)
+    for url in urls:
+        pending[host_of(url)].append(url)
+
+    in_flight = defaultdict(int)
+    futures = {}
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+
+        def dispatch():
+            for host, queue in pending.items():
+                while queue and in_flight[host] < per_host and len(futures) < max_workers:
+                    url = queue.popleft()
+                    in_flight[host] += 1
+                    futures[executor.submit(extract, url)] = (host, url)
+
+        dispatch()
+        while futures:
+            done, _ = wait(futures, return_when=FIRST_COMPLETED)
+            for future in done:
+                host, url = futures.pop(future)
+                in_flight[host] -= 1
+                try:
+                    result = future.result()
+                except Exception:
+                    result = None
+                yield url, result
+            dispatch()
@@ -0,0 +1,61 @@
+import argparse
+import glob
+import os
+import re
+import sys
+import time
+
+# Times challengeSolver.scan against the three whole-page regex searches it
+# replaced, over the saved challenge and product pages, and checks that both
+# agree on which pages are challenges and on the verify payload.
+#
+#   python3 src/scrapper/benchmarks/benchChallenge.py --repeat 2000
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+
+from challengeSolver import scan  # noqa: E402
+
+# the inline patterns the engines used before
+I_PATTERN = re.compile(rb'var i = (\d+)')
+J_PATTERN = re.compile(rb'var j = i [+] Number[(]"(\d+)" [+] "(\d+)"[)]')
+BM_VERIFY_PATTERN = re.compile(rb'"bm-verify"\s*:\s*"([^"]+)')
+
+
+def three_pass(html):
+    i_match = I_PATTERN.search(html)
+    j_match = J_PATTERN.search(html)
+    if not (i_match and j_match):
+        return None
+    bm_verify = BM_VERIFY_PATTERN.search(html)
+    return {'bm-verify': bm_verify[1].decode() if bm_verify else None,
+            'pow': int(i_match[1]) + int(j_match[1] + j_match[2])}
+
+
+def single_pass(html):
+    challenge = scan(html)
+    return challenge.payload() if challenge is not None else None
+
+
+def bench(function, html, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = function(html)
+    return (time.perf_counter() - start) / repeat, result
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Challenge detection benchmark")
+    parser.add_argument("--repeat", type=int, default=1000)
+    parser.add_argument("pages", nargs="*", default=sorted(glob.glob(os.path.join(BENCH_DIR, "fixtures", "*.html"))))
+    args = parser.parse_args()
+
+    for path in args.pages:
+        with open(path, "rb") as f:
+            html = f.read()
+        before, expected = bench(three_pass, html, args.repeat)
+        after, result = bench(single_pass, html, args.repeat)
+        status = "ok" if result == expected else "MISMATCH"
+        kind = "challenge" if result is not None else "page"
+        print(f"{os.path.basename(path):<24} {len(html) / 1024:6.0f} KiB  {kind:<9}  three passes {before * 1e6:8.1f} us"
+              f"  scan {after * 1e6:6.1f} us  {before / after:6.1f}x  {status}")
@@ -0,0 +1,95 @@
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+# Fills a historyStore with synthetic scrapes of the fixture-shaped products
+# (every product with a few colors and sizes, scraped every half hour, prices
+# moving now and then and sizes selling out and coming back), then reports the
+# append rate, bytes per observation against the same observations as JSON
+# lines, and the price history and restock query times after compaction.
+#
+#   python3 src/scrapper/benchmarks/benchHistory.py --products 200 --scrapes 500
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+
+from historyStore import HistoryStore, to_iso  # noqa: E402
+
+COLORS = ("NEGRO", "BLANCO", "AZUL")
+SIZES = ("XS", "S", "M", "L", "XL", "XXL")
+START = 1_760_000_000
+
+
+def product_url(n):
+    return f"https://www.zara.com/ar/es/producto-p{n:08d}.html?v1={n * 10}"
+
+
+def scrapes(products, count, seed):
+    # yields (url, product dict) in scrape order
+    rng = random.Random(seed)
+    prices = {(n, color, size): rng.randrange(20, 90) * 100000 for n in range(products) for color in COLORS for size in SIZES}
+    stock = {key: "in_stock" for key in prices}
+    for scrape in range(count):
+        created = to_iso(START + scrape * 1800)
+        for n in range(products):
+            colors = []
+            for color in COLORS:
+                sizes = []
+                for size in SIZES:
+                    key = (n, color, size)
+                    if rng.random() < 0.01:
+                        prices[key] += rng.choice((-1, 1)) * 100000
+                    if rng.random() < 0.05:
+                        stock[key] = rng.choice(("in_stock", "low_on_stock", "out_of_stock"))
+                    sizes.append({"created": created, "name": size, "availability": stock[key], "price": prices[key]})
+                colors.append({"name": color, "created": created, "hexCode": "#000000", "sizes": sizes})
+            yield product_url(n), {"name": f"PRODUCTO {n}", "created": created, "colors": colors}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Price/stock history store benchmark")
+    parser.add_argument("--products", type=int, default=100)
+    parser.add_argument("--scrapes", type=int, default=200, help="scrapes of every product")
+    parser.add_argument("--queries", type=int, default=50, help="price history queries to time")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        store = HistoryStore(tmp)
+        observations = json_bytes = 0
+        start = time.perf_counter()
+        for url, product in scrapes(args.products, args.scrapes, 1):
+            store.record(url, product)
+            for color in product["colors"]:
+                for size in color["sizes"]:
+                    observations += 1
+                    row = {"product": url, "color": color["name"], **size}
+                    json_bytes += len(json.dumps(row, ensure_ascii=False)) + 1
+        store.flush()
+        append = time.perf_counter() - start
+        segments = len(store.segment_paths())
+
+        start = time.perf_counter()
+        store.compact()
+        compact = time.perf_counter() - start
+        size = sum(os.path.getsize(path) for path in store.segment_paths())
+
+        rng = random.Random(2)
+        start = time.perf_counter()
+        for _ in range(args.queries):
+            store.price_history(product_url(rng.randrange(args.products)))
+        history = (time.perf_counter() - start) / args.queries
+
+        start = time.perf_counter()
+        events = store.restocks()
+        restocks = time.perf_counter() - start
+
+    print(f"{observations} observations  append {observations / append:,.0f}/sec  "
+          f"{segments} segments compacted in {compact * 1000:.0f} ms")
+    print(f"segments {size / 1024:,.0f} KiB ({size / observations:.2f} bytes/observation)  "
+          f"JSON lines {json_bytes / 1024:,.0f} KiB ({json_bytes / observations:.1f} bytes/observation)")
+    print(f"price history of one product {history * 1000:.2f} ms  "
+          f"restocks of every product {restocks * 1000:.0f} ms ({len(events)} events)")
@@ -0,0 +1,39 @@
+import argparse
+import glob
+import os
+import sys
+import time
+
+# Times every available pageParser backend over the saved HTML fixtures and checks
+# that they all pull out the same scripts as BeautifulSoup.
+#
+#   python3 src/scrapper/benchmarks/benchParser.py --repeat 50
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+
+from pageParser import BACKENDS  # noqa: E402
+
+
+def bench(backend, html, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = backend(html)
+    return (time.perf_counter() - start) / repeat, result
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="HTML extraction backend benchmark")
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("fixtures", nargs="*", default=sorted(glob.glob(os.path.join(BENCH_DIR, "fixtures", "product*.html"))))
+    args = parser.parse_args()
+
+    for path in args.fixtures:
+        with open(path, "rb") as f:
+            html = f.read()
+        print(f"{os.path.basename(path)} ({len(html) / 1024:.0f} KiB)")
+        baseline, expected = bench(BACKENDS["bs4"], html, args.repeat)
+        for name, backend in BACKENDS.items():
+            elapsed, result = bench(backend, html, args.repeat)
+            status = "ok" if result == expected else "MISMATCH"
+            print(f"  {name:<11} {elapsed * 1000:9.3f} ms/page  {baseline / elapsed:7.1f}x  {status}")
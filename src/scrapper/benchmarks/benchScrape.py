@@ -0,0 +1,170 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+# End-to-end scrape benchmark against the local mock server, no live traffic.
+# Runs the same jobs in each mode and reports scrapes/sec, per-phase latency
+# percentiles (from the SCRAPER_TRACE records) and the scraper's peak RSS.
+#
+#   single  one process per URL, what ScriptManagerImpl does per cron run
+#   batch   one `--batch` process for all URLs
+#   worker  one `--worker` process fed one job at a time over stdin
+#   async   one asyncEngine.py process reading every job from a URL file
+#
+#   python3 src/scrapper/benchmarks/benchScrape.py --jobs 200 --latency 20 --error-rate 0.02
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+SCRAPPER_DIR = os.path.dirname(BENCH_DIR)
+MODES = ("single", "batch", "worker", "async")
+PERCENTILES = (50, 90, 99)
+
+sys.path.insert(0, BENCH_DIR)
+
+from mockServer import product_urls  # noqa: E402
+
+
+def start_mock_server(args):
+    command = [
+        sys.executable, os.path.join(BENCH_DIR, "mockServer.py"),
+        "--latency", str(args.latency), "--jitter", str(args.jitter),
+        "--error-rate", str(args.error_rate), "--challenge-rate", str(args.challenge_rate),
+    ]
+    server = subprocess.Popen(command, stdout=subprocess.PIPE, text=True)
+    return server, server.stdout.readline().strip()
+
+
+def scraper_env(base, trace_path, cache_dir, result_ttl):
+    env = dict(os.environ)
+    env.update({
+        "SCRAPER_TRACE": trace_path,
+        "SCRAPER_CACHE_DIR": cache_dir,
+        # zara.py reaches the mock server as its only proxy
+        "SCRAPER_PROXIES": base,
+        "SCRAPER_PROXY_FILE": "",
+        # measure the scraper, not the rate limiter
+        "SCRAPER_RATE": "1000000",
+        "SCRAPER_MAX_RATE": "1000000",
+        "SCRAPER_BURST": "1000000",
+        # jobs cycle through a few products; 0 scrapes every one of them
+        "SCRAPER_RESULT_TTL": str(result_ttl),
+    })
+    return env
+
+
+def wait(process):
+    # os.wait4 gives the child's own peak RSS (KiB on Linux)
+    _, status, usage = os.wait4(process.pid, 0)
+    process.returncode = os.waitstatus_to_exitcode(status)
+    return usage.ru_maxrss
+
+
+def run_single(script, urls, env):
+    ok = 0
+    peak = 0
+    for url in urls:
+        process = subprocess.Popen([sys.executable, "-u", script, url], stdout=subprocess.PIPE,
+                                   stderr=subprocess.DEVNULL, text=True, cwd=SCRAPPER_DIR, env=env)
+        output = process.stdout.read()
+        process.stdout.close()
+        peak = max(peak, wait(process))
+        if output.startswith("{"):
+            ok += 1
+    return ok, peak
+
+
+def run_batch(script, urls, env):
+    process = subprocess.Popen([sys.executable, "-u", script, "--batch", *urls], stdout=subprocess.PIPE,
+                               stderr=subprocess.DEVNULL, text=True, cwd=SCRAPPER_DIR, env=env)
+    ok = sum(1 for line in process.stdout if json.loads(line)["ok"])
+    process.stdout.close()
+    return ok, wait(process)
+
+
+def run_worker(script, urls, env):
+    process = subprocess.Popen([sys.executable, "-u", script, "--worker"], stdin=subprocess.PIPE,
+                               stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True,
+                               cwd=SCRAPPER_DIR, env=env)
+    ok = 0
+    for job_id, url in enumerate(urls):
+        process.stdin.write(json.dumps({"id": job_id, "url": url}) + "\n")
+        process.stdin.flush()
+        if json.loads(process.stdout.readline())["ok"]:
+            ok += 1
+    process.stdin.close()
+    process.stdout.close()
+    return ok, wait(process)
+
+
+def run_async(script, urls, env):
+    # always asyncEngine.py, --script only picks the threaded scraper
+    with tempfile.NamedTemporaryFile("w", suffix=".txt") as url_file:
+        url_file.write("\n".join(urls) + "\n")
+        url_file.flush()
+        process = subprocess.Popen([sys.executable, "-u", os.path.join(SCRAPPER_DIR, "asyncEngine.py"), url_file.name],
+                                   stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True, cwd=SCRAPPER_DIR, env=env)
+        ok = sum(1 for line in process.stdout if json.loads(line).get("type") == "product")
+        process.stdout.close()
+        return ok, wait(process)
+
+
+RUNNERS = {"single": run_single, "batch": run_batch, "worker": run_worker, "async": run_async}
+
+
+def percentile(values, q):
+    # nearest-rank on sorted values
+    index = max(0, min(len(values) - 1, round(q / 100 * len(values)) - 1))
+    return values[index]
+
+
+def phase_percentiles(trace_path):
+    samples = {}
+    with open(trace_path, encoding="utf-8") as f:
+        for line in f:
+            record = json.loads(line)
+            samples.setdefault("total", []).append(record["totalMs"])
+            for name, ms in record["phases"].items():
+                samples.setdefault(name, []).append(ms)
+    return {name: [percentile(sorted(values), q) for q in PERCENTILES] for name, values in samples.items()}
+
+
+def report(mode, jobs, ok, elapsed, peak_kib, phases):
+    print(f"{mode:<7} {jobs:>5} jobs  {ok:>5} ok  {elapsed:8.2f}s  {jobs / elapsed:8.2f} scrapes/sec  "
+          f"peak RSS {peak_kib / 1024:6.1f} MiB")
+    print(f"  {'phase':<15}" + "".join(f"{f'p{q}':>10}" for q in PERCENTILES) + "  (ms)")
+    for name, values in phases.items():
+        print(f"  {name:<15}" + "".join(f"{value:10.1f}" for value in values))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Offline end-to-end scrape benchmark")
+    parser.add_argument("--script", default="zaraLocal.py", help="scraper script inside src/scrapper")
+    parser.add_argument("--mode", action="append", choices=MODES, help="mode to run, may be repeated (default: all)")
+    parser.add_argument("--jobs", type=int, default=50, help="scrapes per mode, cycling through the fixture products")
+    parser.add_argument("--latency", type=float, default=0.0, help="mock server latency per request, ms")
+    parser.add_argument("--jitter", type=float, default=0.0, help="mock server latency standard deviation, ms")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of mock responses that are 429/503")
+    parser.add_argument("--challenge-rate", type=float, default=0.0, help="fraction of verified GETs challenged again")
+    parser.add_argument("--result-ttl", type=float, default=0.0, help="SCRAPER_RESULT_TTL for the scraper, seconds")
+    args = parser.parse_args()
+
+    server, base = start_mock_server(args)
+    script = os.path.join(SCRAPPER_DIR, args.script)
+    products = product_urls(base)
+    urls = [products[n % len(products)] for n in range(args.jobs)]
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            for mode in args.mode or MODES:
+                trace_path = os.path.join(tmp, f"{mode}.jsonl")
+                env = scraper_env(base, trace_path, os.path.join(tmp, f"cache-{mode}"), args.result_ttl)
+                start = time.perf_counter()
+                ok, peak = RUNNERS[mode](script, urls, env)
+                elapsed = time.perf_counter() - start
+                phases = phase_percentiles(trace_path) if os.path.exists(trace_path) else {}
+                report(mode, len(urls), ok, elapsed, peak, phases)
+    finally:
+        server.terminate()
+        server.wait()
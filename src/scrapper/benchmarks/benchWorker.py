@@ -0,0 +1,79 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+# Compares jobs/sec of the spawn-per-URL path (what ScriptManagerImpl does today)
+# against a single resident `--worker` process fed over stdin.
+#
+#   python3 src/scrapper/benchmarks/benchWorker.py --script zaraLocal.py --urls urls.txt
+
+SCRAPPER_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def load_urls(args):
+    urls = list(args.url)
+    if args.urls:
+        with open(args.urls) as f:
+            urls.extend(line.strip() for line in f if line.strip())
+    if not urls:
+        sys.exit("No URLs given, use --url or --urls")
+    if args.jobs:
+        return [urls[n % len(urls)] for n in range(args.jobs)]
+    return urls * args.repeat
+
+
+def bench_spawn(script, urls):
+    ok = 0
+    start = time.perf_counter()
+    for url in urls:
+        result = subprocess.run([sys.executable, "-u", script, url], capture_output=True, text=True, cwd=SCRAPPER_DIR)
+        if result.stdout.startswith("{"):
+            ok += 1
+    return time.perf_counter() - start, ok
+
+
+def bench_worker(script, urls):
+    ok = 0
+    start = time.perf_counter()
+    worker = subprocess.Popen(
+        [sys.executable, "-u", script, "--worker"],
+        stdin=subprocess.PIPE,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.DEVNULL,
+        text=True,
+        cwd=SCRAPPER_DIR,
+    )
+    for job_id, url in enumerate(urls):
+        worker.stdin.write(json.dumps({"id": job_id, "url": url}) + "\n")
+        worker.stdin.flush()
+        result = json.loads(worker.stdout.readline())
+        if result["ok"]:
+            ok += 1
+    worker.stdin.close()
+    worker.wait()
+    return time.perf_counter() - start, ok
+
+
+def report(name, elapsed, ok, total):
+    print(f"{name:<8} {total:>5} jobs  {ok:>5} ok  {elapsed:8.2f}s  {total / elapsed:8.2f} jobs/sec")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Spawn-per-URL vs resident worker benchmark")
+    parser.add_argument("--script", default="zaraLocal.py", help="scraper script inside src/scrapper")
+    parser.add_argument("--url", action="append", default=[], help="product URL, may be repeated")
+    parser.add_argument("--urls", help="file with one product URL per line")
+    parser.add_argument("--repeat", type=int, default=1, help="times to repeat the URL list")
+    parser.add_argument("--jobs", type=int, help="total number of jobs, cycling through the URLs")
+    args = parser.parse_args()
+
+    script = os.path.join(SCRAPPER_DIR, args.script)
+    urls = load_urls(args)
+
+    elapsed, ok = bench_spawn(script, urls)
+    report("spawn", elapsed, ok, len(urls))
+    elapsed, ok = bench_worker(script, urls)
+    report("worker", elapsed, ok, len(urls))
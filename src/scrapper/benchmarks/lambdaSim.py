@@ -0,0 +1,115 @@
+import argparse
+import contextlib
+import importlib.util
+import io
+import json
+import os
+import sys
+import tempfile
+import time
+
+# Runs zara-lambda.py's handler in-process the way Lambda would: one cold module
+# load, then a loop of SQS batch invocations against the local mock server.
+# Reports the cold init, the first (cold) invocation and warm invocation
+# percentiles, plus how many messages were published or handed back for
+# redelivery. Some jobs can point at a product the mock server does not have, to
+# exercise the partial-failure path (404, published as an error, not redelivered).
+#
+#   python3 src/scrapper/benchmarks/lambdaSim.py --invocations 50 --batch-size 10 --error-rate 0.05
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+SCRAPPER_DIR = os.path.dirname(BENCH_DIR)
+PERCENTILES = (50, 90, 99)
+
+sys.path.insert(0, BENCH_DIR)
+sys.path.insert(0, SCRAPPER_DIR)
+
+import mockServer  # noqa: E402
+
+
+class Context:
+    # the parts of the Lambda context object a handler commonly reads
+    def __init__(self, request_id, timeout):
+        self.aws_request_id = request_id
+        self.function_name = "zara-lambda-sim"
+        self.deadline = time.monotonic() + timeout
+
+    def get_remaining_time_in_millis(self):
+        return max(0, int((self.deadline - time.monotonic()) * 1000))
+
+
+def load_handler():
+    spec = importlib.util.spec_from_file_location("zara_lambda", os.path.join(SCRAPPER_DIR, "zara-lambda.py"))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module.lambda_handler
+
+
+def sqs_event(invocation, urls):
+    return {"Records": [
+        {"messageId": f"{invocation}-{n}", "body": json.dumps({"url": url}), "eventSource": "aws:sqs"}
+        for n, url in enumerate(urls)
+    ]}
+
+
+def percentile(values, q):
+    # nearest-rank on sorted values
+    index = max(0, min(len(values) - 1, round(q / 100 * len(values)) - 1))
+    return values[index]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local Lambda invocation loop for zara-lambda.py")
+    parser.add_argument("--invocations", type=int, default=20, help="SQS events to deliver")
+    parser.add_argument("--batch-size", type=int, default=10, help="messages per event")
+    parser.add_argument("--gone-every", type=int, default=0, help="make every Nth job a missing product (0: none)")
+    parser.add_argument("--timeout", type=float, default=60.0, help="simulated function timeout, seconds")
+    parser.add_argument("--latency", type=float, default=0.0, help="mock server latency per request, ms")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of mock responses that are 429/503")
+    parser.add_argument("--challenge-rate", type=float, default=0.0, help="fraction of verified GETs challenged again")
+    args = parser.parse_args()
+
+    server = mockServer.start(latency=args.latency / 1000, error_rate=args.error_rate, challenge_rate=args.challenge_rate)
+    base = mockServer.base_url(server)
+    products = mockServer.product_urls(base)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        # environment as the function would be configured, before the module loads
+        os.environ.update({
+            "SCRAPER_CACHE_DIR": tmp,
+            "SCRAPER_RATE": "1000000",
+            "SCRAPER_MAX_RATE": "1000000",
+            "SCRAPER_BURST": "1000000",
+            # every invocation scrapes its pages, not the result cache
+            "SCRAPER_RESULT_TTL": "0",
+        })
+        start = time.perf_counter()
+        handler = load_handler()
+        init_ms = (time.perf_counter() - start) * 1000
+
+        durations = []
+        published = redelivered = job = 0
+        for invocation in range(args.invocations):
+            urls = []
+            for _ in range(args.batch_size):
+                job += 1
+                if args.gone_every and job % args.gone_every == 0:
+                    urls.append(f"{base}/ar/es/missing-p09999999.html")
+                else:
+                    urls.append(products[job % len(products)])
+            output = io.StringIO()
+            start = time.perf_counter()
+            with contextlib.redirect_stdout(output), contextlib.redirect_stderr(io.StringIO()):
+                response = handler(sqs_event(invocation, urls), Context(f"sim-{invocation}", args.timeout))
+            durations.append((time.perf_counter() - start) * 1000)
+            published += len(output.getvalue().splitlines())
+            redelivered += len(response["batchItemFailures"])
+
+    server.shutdown()
+    messages = args.invocations * args.batch_size
+    warm = sorted(durations[1:]) or durations
+    print(f"cold init {init_ms:8.1f} ms   first invocation {durations[0]:8.1f} ms")
+    print(f"warm invocations ({len(warm)}, {args.batch_size} messages each): "
+          + "  ".join(f"p{q} {percentile(warm, q):.1f} ms" for q in PERCENTILES))
+    print(f"{messages} messages  {published} published  {redelivered} returned for redelivery  "
+          f"{messages / (sum(durations) / 1000):.1f} messages/sec")
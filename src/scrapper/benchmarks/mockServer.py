@@ -0,0 +1,152 @@
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from threading import Thread
+from urllib.parse import urlsplit
+import argparse
+import json
+import os
+import random
+import re
+import time
+
+# Local stand-in for zara.com built from the synthetic fixtures. A GET without the
+# bm_verified cookie gets the challenge page; POST /_sec/verify with the right
+# pow sets the cookie, and later GETs get the product page. Requests sent with an
+# absolute URL (i.e. through it as an HTTP proxy) are served the same way, so
+# SCRAPER_PROXIES can point at it too.
+#
+#   python3 src/scrapper/benchmarks/mockServer.py --port 8080 --latency 50 --error-rate 0.05
+#
+# Routes: /<cc>/<lang>/<slug>-p<ref>.html (PRODUCTS below) and /<cc>/<lang>/<slug>-l<id>.html.
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+PRODUCTS = {
+    "5857165": "product.html",
+    "4387400": "product_multicolor.html",
+}
+CATEGORY = "category.html"
+CHALLENGE = "challenge.html"
+
+PRODUCT_PATTERN = re.compile(r"-p0?(\d+)\.html$")
+CATEGORY_PATTERN = re.compile(r"-l\d+\.html$")
+VERIFY_PATH = "/_sec/verify"
+
+
+def load_fixture(name):
+    with open(os.path.join(FIXTURES_DIR, name), "rb") as f:
+        return f.read()
+
+
+def expected_pow(challenge):
+    i = int(re.search(rb"var i = (\d+)", challenge)[1])
+    j = re.search(rb'Number[(]"(\d+)" [+] "(\d+)"[)]', challenge)
+    return i + int(j[1] + j[2])
+
+
+def make_handler(latency=0.0, jitter=0.0, error_rate=0.0, challenge_rate=0.0):
+    challenge = load_fixture(CHALLENGE)
+    pow_answer = expected_pow(challenge)
+    products = {ref: load_fixture(name) for ref, name in PRODUCTS.items()}
+    category = load_fixture(CATEGORY)
+
+    class MockZaraHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, *args):
+            pass
+
+        def delay(self):
+            if latency or jitter:
+                time.sleep(max(0.0, random.gauss(latency, jitter)))
+
+        def respond(self, status, body=b"", content_type="text/html; charset=utf-8", cookie=None):
+            self.send_response(status)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            if cookie:
+                self.send_header("Set-Cookie", cookie)
+            self.end_headers()
+            self.wfile.write(body)
+
+        def simulated_error(self):
+            if error_rate and random.random() < error_rate:
+                self.respond(random.choice((429, 503)), b"")
+                return True
+            return False
+
+        def do_GET(self):
+            self.delay()
+            if self.simulated_error():
+                return
+            path = urlsplit(self.path).path
+            product = PRODUCT_PATTERN.search(path)
+            if product and product[1] in products:
+                body = products[product[1]]
+            elif CATEGORY_PATTERN.search(path):
+                body = category
+            else:
+                self.respond(404, b"Not found")
+                return
+            verified = "bm_verified=1" in self.headers.get("Cookie", "")
+            if not verified or (challenge_rate and random.random() < challenge_rate):
+                self.respond(200, challenge, cookie="ak_bmsc=mock; Path=/")
+                return
+            self.respond(200, body)
+
+        def do_POST(self):
+            self.delay()
+            length = int(self.headers.get("Content-Length") or 0)
+            data = self.rfile.read(length) if length else b""
+            if urlsplit(self.path).path != VERIFY_PATH:
+                self.respond(404, b"Not found")
+                return
+            if self.simulated_error():
+                return
+            try:
+                ok = json.loads(data)["pow"] == pow_answer
+            except (ValueError, KeyError, TypeError):
+                ok = False
+            self.respond(200, json.dumps({"reload": ok}).encode(), "application/json",
+                         cookie="bm_verified=1; Path=/" if ok else None)
+
+    return MockZaraHandler
+
+
+class MockServer(ThreadingHTTPServer):
+    daemon_threads = True
+    # the default backlog of 5 drops connections when hundreds open at once
+    request_queue_size = 1024
+
+
+def start(port=0, latency=0.0, jitter=0.0, error_rate=0.0, challenge_rate=0.0):
+    # latency and jitter are in seconds; returns the running server
+    server = MockServer(("127.0.0.1", port), make_handler(latency, jitter, error_rate, challenge_rate))
+    Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def base_url(server):
+    return f"http://127.0.0.1:{server.server_address[1]}"
+
+
+def product_urls(base):
+    return [f"{base}/ar/es/product-p0{ref}.html" for ref in PRODUCTS]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Mock zara.com server backed by the benchmark fixtures")
+    parser.add_argument("--port", type=int, default=0)
+    parser.add_argument("--latency", type=float, default=0.0, help="mean added latency per request, ms")
+    parser.add_argument("--jitter", type=float, default=0.0, help="latency standard deviation, ms")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of requests answered with 429/503")
+    parser.add_argument("--challenge-rate", type=float, default=0.0, help="fraction of verified GETs challenged again")
+    args = parser.parse_args()
+
+    server = start(args.port, args.latency / 1000, args.jitter / 1000, args.error_rate, args.challenge_rate)
+    # the first stdout line is the base URL, so a parent process can read the port
+    print(base_url(server), flush=True)
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
@@ -0,0 +1,114 @@
+from datetime import datetime
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+import re
+
+from pageParser import extract_scripts, extract_view_payload
+
+# Category and search pages embed every listed product in their viewPayload as
+# `commercialComponents` entries, each with per-color price and availability.
+# crawl_category walks those pages lazily, one `page` query parameter at a time,
+# and only fetches a product page when the listing has no sizes for it.
+
+LOCALE_PATTERN = re.compile(r'^/([a-z]{2})/([a-z]{2})/')
+COLOR_FIELDS = ("price", "oldPrice", "discountPercentage", "availability")
+SIZE_FIELDS = ("name", "availability", "oldPrice", "price", "discountPercentage")
+
+
+def page_url(url, page):
+    parts = urlsplit(url)
+    query = [(key, value) for key, value in parse_qsl(parts.query) if key != "page"]
+    if page > 1:
+        query.append(("page", str(page)))
+    return urlunsplit(parts._replace(query=urlencode(query)))
+
+
+def product_url(url, seo):
+    if not seo.get("keyword") or not seo.get("seoProductId"):
+        return None
+    parts = urlsplit(url)
+    locale = LOCALE_PATTERN.match(parts.path)
+    prefix = f"/{locale[1]}/{locale[2]}" if locale else ""
+    link = f"{parts.scheme}://{parts.netloc}{prefix}/{seo['keyword']}-p{seo['seoProductId']}.html"
+    if seo.get("discernProductId"):
+        link += f"?v1={seo['discernProductId']}"
+    return link
+
+
+def iter_components(node):
+    stack = [node]
+    while stack:
+        current = stack.pop()
+        if isinstance(current, dict):
+            components = current.get("commercialComponents")
+            if isinstance(components, list):
+                for component in components:
+                    if isinstance(component, dict) and component.get("type", "Product") == "Product" and component.get("name"):
+                        yield component
+                continue
+            stack.extend(reversed([value for value in current.values() if isinstance(value, (dict, list))]))
+        elif isinstance(current, list):
+            stack.extend(reversed([value for value in current if isinstance(value, (dict, list))]))
+
+
+def listing_product(component, url, created):
+    product = {
+        "id": component.get("id"),
+        "name": component["name"],
+        "url": product_url(url, component.get("seo") or {}),
+        "created": created,
+        "colors": [],
+    }
+    for color in (component.get("detail") or {}).get("colors") or []:
+        color_dict = {"name": color.get("name"), "created": created, "hexCode": color.get("hexCode")}
+        for field in COLOR_FIELDS:
+            value = color.get(field, component.get(field))
+            if value is not None:
+                color_dict[field] = value
+        if color.get("sizes"):
+            color_dict["sizes"] = [
+                {"created": created, **{field: size[field] for field in SIZE_FIELDS if size.get(field) is not None}}
+                for size in color["sizes"]
+            ]
+        product["colors"].append(color_dict)
+    return product
+
+
+def parse_listing(html, url):
+    created = datetime.utcnow().isoformat()
+    _, script_tags = extract_scripts(html)
+    for script_content in script_tags:
+        view_payload = extract_view_payload(script_content)
+        if view_payload is not None:
+            return [listing_product(component, url, created) for component in iter_components(view_payload)]
+    return []
+
+
+def needs_detail(product):
+    return not product["colors"] or any("sizes" not in color for color in product["colors"])
+
+
+def crawl_category(url, fetch, extract_products=None, max_pages=None):
+    # `fetch(url)` returns the page bytes; `extract_products(urls)` is the batch
+    # scraper yielding (url, product), used only for listing entries without
+    # sizes. A page's detail scrapes run as one batch, products keep listing order.
+    seen = set()
+    page = 1
+    while max_pages is None or page <= max_pages:
+        products = parse_listing(fetch(page_url(url, page)), url)
+        fresh = [product for product in products if (product["id"] or product["url"]) not in seen]
+        if not fresh:
+            return
+        for product in fresh:
+            seen.add(product["id"] or product["url"])
+        details = {}
+        if extract_products is not None:
+            wanted = list(dict.fromkeys(product["url"] for product in fresh if product["url"] and needs_detail(product)))
+            if wanted:
+                details = dict(extract_products(wanted))
+        for product in fresh:
+            detail = details.get(product["url"])
+            if detail:
+                detail.url = product["url"]
+                product = detail
+            yield product
+        page += 1
@@ -0,0 +1,44 @@
+from threading import Lock
+import os
+import time
+
+CLEARANCE_TTL = float(os.environ.get("SCRAPER_CLEARANCE_TTL", "600"))
+
+# Akamai `bm-verify` clearance cookies keyed by egress identity (the proxy URL, or
+# "direct" when no proxy is used). While an entry is fresh, requests through that
+# egress skip the interstitial and go straight to the product page.
+
+
+class ClearanceCache:
+    def __init__(self, ttl=None):
+        self.ttl = CLEARANCE_TTL if ttl is None else ttl
+        self.entries = {}
+        self.lock = Lock()
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            expires_at, cookies = entry
+            if time.monotonic() >= expires_at:
+                del self.entries[key]
+                return None
+            return dict(cookies)
+
+    def put(self, key, *cookie_jars):
+        cookies = {}
+        for jar in cookie_jars:
+            cookies.update((cookie.name, cookie.value) for cookie in jar)
+        if not cookies:
+            return
+        with self.lock:
+            self.entries[key] = (time.monotonic() + self.ttl, cookies)
+
+    def invalidate(self, key):
+        with self.lock:
+            self.entries.pop(key, None)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
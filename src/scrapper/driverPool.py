@@ -0,0 +1,123 @@
+from contextlib import contextmanager
+from collections import deque
+from threading import Condition
+import atexit
+import os
+import time
+from selenium import webdriver
+from selenium.common.exceptions import TimeoutException, WebDriverException
+from selenium.webdriver.chrome.options import Options
+from selenium.webdriver.chrome.service import Service
+
+DRIVER_POOL_SIZE = int(os.environ.get("SCRAPER_DRIVER_POOL_SIZE", "2"))
+CHROMEDRIVER_PATH = os.environ.get("SCRAPER_CHROMEDRIVER", "/usr/local/bin/chromedriver/chromedriver")
+DRIVER_WAIT = float(os.environ.get("SCRAPER_DRIVER_WAIT", "60"))
+
+# Resources the scrapers never look at; blocking them keeps page loads and memory down
+BLOCKED_URLS = ["*.png", "*.jpg", "*.jpeg", "*.gif", "*.webp", "*.svg", "*.css", "*.woff", "*.woff2", "*.ttf", "*.mp4"]
+
+
+def build_options():
+    chrome_options = Options()
+    chrome_options.add_argument("--headless")
+    chrome_options.add_argument("--no-sandbox")
+    chrome_options.add_argument("--disable-dev-shm-usage")
+    chrome_options.add_argument("--blink-settings=imagesEnabled=false")
+    chrome_options.add_experimental_option("prefs", {
+        "profile.managed_default_content_settings.images": 2,
+        "profile.managed_default_content_settings.stylesheets": 2,
+        "profile.managed_default_content_settings.fonts": 2,
+    })
+    # return at DOMContentLoaded, the readiness waits take it from there
+    chrome_options.page_load_strategy = "eager"
+    return chrome_options
+
+
+class DriverPool:
+    # Keeps up to `size` warm headless Chrome instances. Each driver keeps its tab
+    # between URLs; a driver that errors (other than a wait timeout) is discarded
+    # and rebuilt on demand. `created` and `idle` change under one condition, so
+    # a discard wakes a caller waiting for a driver to build the replacement.
+
+    def __init__(self, size=None, executable_path=None, wait=None):
+        self.size = size or DRIVER_POOL_SIZE
+        self.executable_path = executable_path or CHROMEDRIVER_PATH
+        self.wait = DRIVER_WAIT if wait is None else wait
+        self.idle = deque()
+        self.created = 0
+        self.changed = Condition()
+
+    def create_driver(self):
+        service = Service(executable_path=self.executable_path)
+        driver = webdriver.Chrome(service=service, options=build_options())
+        driver.execute_cdp_cmd("Network.enable", {})
+        driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": BLOCKED_URLS})
+        return driver
+
+    def take(self, timeout=None):
+        # an idle driver, or a new one while the pool is below size; waits at
+        # most `timeout` seconds (SCRAPER_DRIVER_WAIT) for one to free up
+        wait = self.wait if timeout is None else timeout
+        deadline = time.monotonic() + wait
+        with self.changed:
+            while not self.idle and self.created >= self.size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise TimeoutException(f"no browser free after {wait:g}s")
+                self.changed.wait(remaining)
+            if self.idle:
+                return self.idle.popleft()
+            self.created += 1
+        try:
+            return self.create_driver()
+        except Exception:
+            self.forget()
+            raise
+
+    def give_back(self, driver):
+        with self.changed:
+            self.idle.append(driver)
+            self.changed.notify()
+
+    def forget(self):
+        # frees a slot, so a waiting caller can create a driver
+        with self.changed:
+            self.created -= 1
+            self.changed.notify()
+
+    def discard(self, driver):
+        self.forget()
+        try:
+            driver.quit()
+        except WebDriverException:
+            pass
+
+    @contextmanager
+    def acquire(self):
+        driver = self.take()
+        try:
+            yield driver
+        except TimeoutException:
+            # the page was slow, the browser itself is fine
+            self.give_back(driver)
+            raise
+        except WebDriverException:
+            self.discard(driver)
+            raise
+        except BaseException:
+            self.give_back(driver)
+            raise
+        else:
+            self.give_back(driver)
+
+    def close(self):
+        while True:
+            with self.changed:
+                if not self.idle:
+                    return
+                driver = self.idle.popleft()
+            self.discard(driver)
+
+
+driver_pool = DriverPool()
+atexit.register(driver_pool.close)
@@ -0,0 +1,454 @@
+from array import array
+from bisect import bisect_left
+from datetime import datetime, timezone
+from itertools import accumulate
+from math import gcd
+from threading import Lock, Thread
+import atexit
+import fcntl
+import json
+import mmap
+import os
+import sqlite3
+import struct
+import sys
+import time
+import uuid
+
+from pageCache import CACHE_DIR
+from resultCache import normalize_url
+
+HISTORY = os.environ.get("SCRAPER_HISTORY", "0") == "1"
+HISTORY_DIR = os.environ.get("SCRAPER_HISTORY_DIR") or os.path.join(CACHE_DIR, "history")
+HISTORY_BUFFER = int(os.environ.get("SCRAPER_HISTORY_BUFFER", "1024"))
+HISTORY_FLUSH_SECONDS = float(os.environ.get("SCRAPER_HISTORY_FLUSH_SECONDS", "30"))
+HISTORY_TIER_SEGMENTS = int(os.environ.get("SCRAPER_HISTORY_TIER_SEGMENTS", "4"))
+
+# Local price and stock history. With SCRAPER_HISTORY=1 every scraped product
+# appends one observation per size: (time, price, oldPrice, availability,
+# futurePrice price), in a series keyed by (normalized product URL, color, size).
+# Category listing entries carry price and availability per color, without
+# sizes; they append one observation per color, under size "".
+#
+# Observations are buffered and written as immutable column segments. A segment
+# sorts its rows by (series, time) and stores each numeric column as deltas from
+# the previous row of the same series, divided by their common divisor and in
+# the narrowest integer type that fits: prices rarely move, and then by round
+# amounts, so most columns end up one byte per row. The
+# first value of every series run is kept in a per-segment index. Readers mmap a
+# segment and cast its columns in place, finding a series by bisecting the index.
+# Every process writes its own segments. Compaction is size-tiered: segments
+# within a factor of two in size form a tier, and a tier of
+# SCRAPER_HISTORY_TIER_SEGMENTS segments is merged into one segment of the next
+# tier, so every row is rewritten about log(rows) times rather than on every
+# compaction. It runs on a background thread, started by a flush or by the
+# first record of a process, never in the exit flush; `compact` merges every
+# segment into one.
+#
+# Series ids and availability codes live in history.sqlite next to the segments.
+#
+#   python3 historyStore.py prices <url> [--color C] [--size S] [--since T] [--until T]
+#   python3 historyStore.py restocks [<url>] [--since T] [--until T]
+#   python3 historyStore.py compact
+#
+# print one JSON object per line; T is an ISO time like `created`.
+
+MAGIC = b"ZTS1"
+# magic, rows, series, typecodes and scales of the DELTA_COLUMNS; then the
+# columns: series bases (int64 per delta column), ids, starts, counts, deltas,
+# availability codes
+HEADER = struct.Struct("<4sII4s4q")
+SEGMENT_SUFFIX = ".zts"
+# row layout: series, time, price, old price, future price, availability code
+DELTA_COLUMNS = 4
+NONE = -1
+WIDTHS = ("b", "h", "i", "q")
+# segments smaller than this are all in the first tier
+SMALL_SEGMENT = 64 * 1024
+AVAILABLE = {"in_stock", "low_on_stock"}
+# color-level fields of a listing entry, recorded as its only size
+COLOR_FIELDS = ("created", "price", "oldPrice", "availability")
+
+
+def to_epoch(created):
+    # `created` is a naive UTC ISO timestamp
+    return int(datetime.fromisoformat(created).replace(tzinfo=timezone.utc).timestamp())
+
+
+def to_iso(epoch):
+    return datetime.fromtimestamp(epoch, timezone.utc).replace(tzinfo=None).isoformat()
+
+
+def as_int(value):
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return int(round(value))
+    return NONE
+
+
+def narrowest(values):
+    low, high = min(values, default=0), max(values, default=0)
+    for typecode in WIDTHS:
+        bits = array(typecode).itemsize * 8 - 1
+        if -(1 << bits) <= low and high < (1 << bits):
+            return typecode
+    raise OverflowError("delta does not fit in 64 bits")
+
+
+def write_segment(path, rows):
+    # rows: (series, time, price, old price, future price, availability code)
+    rows = sorted(rows)
+    ids, starts, counts = array("I"), array("I"), array("I")
+    bases = [array("q") for _ in range(DELTA_COLUMNS)]
+    deltas = [[] for _ in range(DELTA_COLUMNS)]
+    previous = None
+    for index, row in enumerate(rows):
+        if previous is None or row[0] != previous[0]:
+            ids.append(row[0])
+            starts.append(index)
+            counts.append(0)
+            for column in range(DELTA_COLUMNS):
+                bases[column].append(row[1 + column])
+                deltas[column].append(0)
+        else:
+            for column in range(DELTA_COLUMNS):
+                deltas[column].append(row[1 + column] - previous[1 + column])
+        counts[-1] += 1
+        previous = row
+    scales = [gcd(*column) or 1 for column in deltas]
+    deltas = [[delta // scale for delta in column] for scale, column in zip(scales, deltas)]
+    typecodes = "".join(narrowest(column) for column in deltas)
+    columns = bases + [ids, starts, counts] + [array(typecode, column) for typecode, column in zip(typecodes, deltas)]
+    columns.append(array("B", (row[5] for row in rows)))
+    temporary = path + ".tmp"
+    with open(temporary, "wb") as segment:
+        segment.write(HEADER.pack(MAGIC, len(rows), len(ids), typecodes.encode(), *scales))
+        for column in columns:
+            data = column.tobytes()
+            # every column starts 8-byte aligned
+            segment.write(data + bytes(-len(data) % 8))
+    os.replace(temporary, path)
+
+
+class Segment:
+    # read-only mmap view of one segment file
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as segment:
+            self.map = mmap.mmap(segment.fileno(), 0, access=mmap.ACCESS_READ)
+        self.view = memoryview(self.map)
+        magic, self.rows, series, typecodes, *self.scales = HEADER.unpack_from(self.view)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a history segment")
+        offset = HEADER.size
+
+        def column(typecode, length):
+            nonlocal offset
+            size = array(typecode).itemsize * length
+            values = self.view[offset:offset + size].cast(typecode)
+            offset += size + -size % 8
+            return values
+
+        self.bases = [column("q", series) for _ in range(DELTA_COLUMNS)]
+        self.ids, self.starts, self.counts = (column("I", series) for _ in range(3))
+        self.deltas = [column(typecode, self.rows) for typecode in typecodes.decode()]
+        self.availability = column("B", self.rows)
+
+    def read(self, series_id):
+        # [(time, price, old price, future price, availability code)] of one series
+        index = bisect_left(self.ids, series_id)
+        if index == len(self.ids) or self.ids[index] != series_id:
+            return []
+        start, count = self.starts[index], self.counts[index]
+        columns = []
+        for column, scale in enumerate(self.scales):
+            deltas = self.deltas[column][start + 1:start + count]
+            if scale != 1:
+                deltas = map(scale.__mul__, deltas)
+            columns.append(accumulate(deltas, initial=self.bases[column][index]))
+        return list(zip(*columns, self.availability[start:start + count]))
+
+    def all_rows(self):
+        for series_id in self.ids:
+            for row in self.read(series_id):
+                yield (series_id,) + row
+
+    def close(self):
+        # the casts must be released before the map can close
+        for view in self.bases + self.deltas + [self.ids, self.starts, self.counts, self.availability, self.view]:
+            view.release()
+        self.map.close()
+
+
+def tiers(paths):
+    # segment paths grouped by size, each group within a factor of two of its smallest
+    groups = []
+    for size, path in sorted((max(os.path.getsize(path), SMALL_SEGMENT), path) for path in paths):
+        if groups and size <= groups[-1][0] * 2:
+            groups[-1][1].append(path)
+        else:
+            groups.append((size, [path]))
+    return [group for _, group in groups]
+
+
+class HistoryStore:
+    def __init__(self, directory=None):
+        self.directory = directory or HISTORY_DIR
+        self.connection = None
+        self.db_lock = Lock()
+        self.series_cache = {}
+        self.codes = {}
+        self.values = {}
+        self.buffer = []
+        self.buffered_since = None
+        self.lock = Lock()
+        self.compactor = None
+        self.checked = False
+        atexit.register(self.flush, compact=False)
+
+    def connect(self):
+        if self.connection is None:
+            os.makedirs(self.directory, exist_ok=True)
+            self.connection = sqlite3.connect(os.path.join(self.directory, "history.sqlite"), timeout=10,
+                                              check_same_thread=False)
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS series (id INTEGER PRIMARY KEY, product TEXT, color TEXT, size TEXT, "
+                "UNIQUE (product, color, size))")
+            self.connection.execute("CREATE TABLE IF NOT EXISTS codes (id INTEGER PRIMARY KEY, value TEXT UNIQUE)")
+        return self.connection
+
+    def series_id(self, product, color, size):
+        key = (product, color, size)
+        series_id = self.series_cache.get(key)
+        if series_id is None:
+            with self.db_lock:
+                connection = self.connect()
+                connection.execute("INSERT OR IGNORE INTO series (product, color, size) VALUES (?, ?, ?)", key)
+                connection.commit()
+                series_id = connection.execute(
+                    "SELECT id FROM series WHERE product = ? AND color = ? AND size = ?", key).fetchone()[0]
+            self.series_cache[key] = series_id
+        return series_id
+
+    def code(self, availability):
+        # small integer for an availability string, 0 when missing
+        if availability is None:
+            return 0
+        code = self.codes.get(availability)
+        if code is None:
+            with self.db_lock:
+                connection = self.connect()
+                connection.execute("INSERT OR IGNORE INTO codes (value) VALUES (?)", (availability,))
+                connection.commit()
+                code = connection.execute("SELECT id FROM codes WHERE value = ?", (availability,)).fetchone()[0]
+            if code > 255:
+                raise OverflowError("more than 255 availability values")
+            self.codes[availability] = code
+        return code
+
+    def value(self, code):
+        if code == 0:
+            return None
+        if code not in self.values:
+            with self.db_lock:
+                self.values.update(self.connect().execute("SELECT id, value FROM codes").fetchall())
+        return self.values.get(code)
+
+    def record(self, url, product):
+        # Appends one observation per size of `product` (the to_dict() shape),
+        # or per color for a listing entry
+        product_key = normalize_url(url)
+        rows = []
+        for color in product["colors"]:
+            sizes = color.get("sizes") or [{field: color.get(field) for field in COLOR_FIELDS}]
+            for size in sizes:
+                future_price = size.get("futurePrice") or {}
+                rows.append((
+                    self.series_id(product_key, color["name"], size.get("name") or ""),
+                    to_epoch(size.get("created") or product["created"]),
+                    as_int(size.get("price")),
+                    as_int(size.get("oldPrice")),
+                    as_int(future_price.get("price")),
+                    self.code(size.get("availability")),
+                ))
+        with self.lock:
+            self.buffer.extend(rows)
+            if self.buffered_since is None:
+                self.buffered_since = time.monotonic()
+            due = len(self.buffer) >= HISTORY_BUFFER or time.monotonic() - self.buffered_since >= HISTORY_FLUSH_SECONDS
+            # one process per scrape only flushes at exit: it compacts what
+            # earlier processes left while it scrapes
+            check, self.checked = not self.checked, True
+        if due:
+            self.flush()
+        elif check:
+            self.compact_in_background()
+
+    def segment_paths(self):
+        if not os.path.isdir(self.directory):
+            return []
+        return sorted(os.path.join(self.directory, name) for name in os.listdir(self.directory)
+                      if name.endswith(SEGMENT_SUFFIX))
+
+    def new_segment_path(self):
+        return os.path.join(self.directory, f"{int(time.time() * 1000):013d}-{uuid.uuid4().hex[:8]}{SEGMENT_SUFFIX}")
+
+    def flush(self, compact=True):
+        with self.lock:
+            rows, self.buffer, self.buffered_since = self.buffer, [], None
+        if not rows:
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        write_segment(self.new_segment_path(), rows)
+        if compact:
+            self.compact_in_background()
+
+    def full_tiers(self):
+        return [group for group in tiers(self.segment_paths()) if len(group) >= HISTORY_TIER_SEGMENTS]
+
+    def compact_in_background(self):
+        if not self.full_tiers():
+            return
+        with self.lock:
+            if self.compactor is not None and self.compactor.is_alive():
+                return
+            # not a daemon: exit waits for a merge rather than leaving its inputs behind
+            self.compactor = Thread(target=self.compact, kwargs={"wait": False, "tiered": True},
+                                    name="history-compact")
+            self.compactor.start()
+
+    def compact(self, wait=True, tiered=False):
+        # Merges every segment into one, or with tiered=True every full tier
+        # until none is left. Only one process compacts at a time; with
+        # wait=False a process finding another one compacting leaves it be
+        os.makedirs(self.directory, exist_ok=True)
+        with open(os.path.join(self.directory, "compact.lock"), "w") as lock:
+            try:
+                fcntl.flock(lock, fcntl.LOCK_EX if wait else fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                return
+            if not tiered:
+                self.merge(self.segment_paths())
+                return
+            groups = self.full_tiers()
+            while groups:
+                for group in groups:
+                    self.merge(group)
+                groups = self.full_tiers()
+
+    def merge(self, paths):
+        if len(paths) < 2:
+            return
+        rows = []
+        for path in paths:
+            segment = Segment(path)
+            rows.extend(segment.all_rows())
+            segment.close()
+        write_segment(self.new_segment_path(), rows)
+        for path in paths:
+            os.remove(path)
+
+    def series(self, url=None, color=None, size=None):
+        # [(series id, product, color, size)] matching the given parts
+        clauses, params = [], []
+        for column, value in (("product", normalize_url(url) if url else None), ("color", color), ("size", size)):
+            if value is not None:
+                clauses.append(f"{column} = ?")
+                params.append(value)
+        where = f" WHERE {' AND '.join(clauses)}" if clauses else ""
+        with self.db_lock:
+            return self.connect().execute(f"SELECT id, product, color, size FROM series{where} ORDER BY id",
+                                          params).fetchall()
+
+    def observations(self, series_ids, since=None, until=None):
+        # {series id: [(time, price, old price, future price, availability code)]}
+        # in time order, from every segment plus the rows not yet flushed
+        since = to_epoch(since) if since else None
+        until = to_epoch(until) if until else None
+        found = {series_id: [] for series_id in series_ids}
+        for path in self.segment_paths():
+            try:
+                segment = Segment(path)
+            except FileNotFoundError:
+                # compacted away since the listing; its rows are in the new segment
+                continue
+            for series_id in found:
+                found[series_id].extend(segment.read(series_id))
+            segment.close()
+        with self.lock:
+            for row in self.buffer:
+                if row[0] in found:
+                    found[row[0]].append(row[1:])
+        for series_id, rows in found.items():
+            rows.sort(key=lambda row: row[0])
+            found[series_id] = [row for row in rows
+                                if (since is None or row[0] >= since) and (until is None or row[0] <= until)]
+        return found
+
+    def price_history(self, url, color=None, size=None, since=None, until=None):
+        # the observations where price, oldPrice or futurePrice changed, per size
+        series = self.series(url, color, size)
+        observations = self.observations([row[0] for row in series], since, until)
+        history = []
+        for series_id, _, color_name, size_name in series:
+            last = None
+            for observed, price, old_price, future_price, _ in observations[series_id]:
+                prices = (price, old_price, future_price)
+                if prices == last:
+                    continue
+                last = prices
+                point = {"time": to_iso(observed), "color": color_name, "size": size_name,
+                         "price": price if price != NONE else None}
+                if old_price != NONE:
+                    point["oldPrice"] = old_price
+                if future_price != NONE:
+                    point["futurePrice"] = future_price
+                history.append(point)
+        return history
+
+    def restocks(self, url=None, since=None, until=None):
+        # sizes that went from unavailable to available between two observations
+        series = self.series(url)
+        observations = self.observations([row[0] for row in series], since, until)
+        events = []
+        for series_id, product, color_name, size_name in series:
+            previous = None
+            for observed, _, _, _, code in observations[series_id]:
+                availability = self.value(code)
+                if previous is not None and previous not in AVAILABLE and availability in AVAILABLE:
+                    events.append({"time": to_iso(observed), "product": product, "color": color_name,
+                                   "size": size_name, "availability": availability, "previous": previous})
+                previous = availability
+        events.sort(key=lambda event: event["time"])
+        return events
+
+
+history_store = HistoryStore()
+
+
+def option(args, name):
+    if name in args:
+        index = args.index(name)
+        value = args[index + 1]
+        del args[index:index + 2]
+        return value
+    return None
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    command = args.pop(0) if args else None
+    since, until = option(args, "--since"), option(args, "--until")
+    if command == "prices" and args:
+        color, size = option(args, "--color"), option(args, "--size")
+        results = history_store.price_history(args[0], color, size, since, until)
+    elif command == "restocks":
+        results = history_store.restocks(args[0] if args else None, since, until)
+    elif command == "compact" and not args:
+        history_store.compact()
+        results = []
+    else:
+        print("Usage: python historyStore.py prices <url> [--color C] [--size S] [--since T] [--until T]"
+              " | restocks [<url>] [--since T] [--until T] | compact", file=sys.stderr)
+        sys.exit(1)
+    for result in results:
+        print(json.dumps(result, ensure_ascii=False))
@@ -0,0 +1,86 @@
+from threading import Lock
+import hashlib
+import json
+import os
+import sqlite3
+import time
+
+CACHE_DIR = os.environ.get("SCRAPER_CACHE_DIR", ".scraper-cache")
+UNCHANGED_MAX_AGE = float(os.environ.get("SCRAPER_UNCHANGED_MAX_AGE", "3600"))
+
+# Per (cache key, URL) validators and a hash of the viewPayload product section.
+# The cache key identifies the consumer (the Node side passes the schedule id), so
+# one schedule seeing a change never hides it from another schedule on the same URL.
+# A full product is still emitted at least every UNCHANGED_MAX_AGE seconds.
+
+UNCHANGED = {"unchanged": True}
+
+
+def payload_digest(product_section):
+    data = json.dumps(product_section, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+    return hashlib.blake2b(data.encode(), digest_size=16).hexdigest()
+
+
+def validator_headers(validators):
+    # If-None-Match / If-Modified-Since for the ETag and Last-Modified response
+    # headers in `validators`
+    headers = {}
+    if validators.get("ETag"):
+        headers["If-None-Match"] = validators["ETag"]
+    if validators.get("Last-Modified"):
+        headers["If-Modified-Since"] = validators["Last-Modified"]
+    return headers
+
+
+class PageCache:
+    def __init__(self, path=None, max_age=None):
+        self.path = path or os.path.join(CACHE_DIR, "pages.sqlite")
+        self.max_age = UNCHANGED_MAX_AGE if max_age is None else max_age
+        self.connection = None
+        self.lock = Lock()
+
+    def connect(self):
+        if self.connection is None:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            self.connection = sqlite3.connect(self.path, timeout=10, check_same_thread=False)
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS pages ("
+                "cache_key TEXT, url TEXT, etag TEXT, last_modified TEXT, digest TEXT, emitted_at REAL, "
+                "PRIMARY KEY (cache_key, url))"
+            )
+        return self.connection
+
+    def get(self, cache_key, url):
+        with self.lock:
+            row = self.connect().execute(
+                "SELECT etag, last_modified, digest, emitted_at FROM pages WHERE cache_key = ? AND url = ?",
+                (cache_key, url),
+            ).fetchone()
+        if row is None:
+            return None
+        return {"etag": row[0], "lastModified": row[1], "digest": row[2], "emittedAt": row[3]}
+
+    def is_fresh(self, entry):
+        return entry is not None and time.time() - entry["emittedAt"] < self.max_age
+
+    def conditional_headers(self, cache_key, url):
+        entry = self.get(cache_key, url)
+        if not self.is_fresh(entry):
+            return {}
+        return validator_headers({"ETag": entry["etag"], "Last-Modified": entry["lastModified"]})
+
+    def fresh_digest(self, cache_key, url):
+        entry = self.get(cache_key, url)
+        return entry["digest"] if self.is_fresh(entry) else None
+
+    def is_unchanged(self, cache_key, url, digest):
+        return digest is not None and self.fresh_digest(cache_key, url) == digest
+
+    def store(self, cache_key, url, response_headers, digest):
+        with self.lock:
+            connection = self.connect()
+            connection.execute(
+                "INSERT OR REPLACE INTO pages VALUES (?, ?, ?, ?, ?, ?)",
+                (cache_key, url, response_headers.get("ETag"), response_headers.get("Last-Modified"), digest, time.time()),
+            )
+            connection.commit()
@@ -0,0 +1,174 @@
+from functools import lru_cache
+from html import unescape
+import json
+import os
+import re
+
+from tracing import current_trace
+
+try:
+    import lxml.html
+except ImportError:
+    lxml = None
+
+try:
+    from selectolax.lexbor import LexborHTMLParser as HTMLParser
+except ImportError:
+    HTMLParser = None
+
+# The scrapers only need two things out of a product page: the first
+# `application/ld+json` script and the `data-compress` scripts that carry
+# `window.zara.viewPayload`. The default "fast" backend finds them with a single
+# regex pass over the raw bytes instead of building a full tree. SCRAPER_PARSER
+# selects "lxml" or "selectolax" when installed, or "bs4" to force the old path.
+# Any backend that comes back empty falls back to BeautifulSoup.
+
+PARSER = os.environ.get("SCRAPER_PARSER", "fast")
+
+SCRIPT_PATTERN = re.compile(rb'<script\b([^>]*)>(.*?)</script\s*>', re.DOTALL | re.IGNORECASE)
+ATTR_PATTERN = re.compile(rb'([^\s=/>]+)(?:\s*=\s*(?:"([^"]*)"|\'([^\']*)\'|([^\s>]+)))?')
+
+LD_JSON_TYPE = b'application/ld+json'
+JAVASCRIPT_TYPE = b'text/javascript'
+
+
+def parse_attrs(raw):
+    attrs = {}
+    for match in ATTR_PATTERN.finditer(raw):
+        value = next((group for group in match.groups()[1:] if group is not None), b"")
+        attrs.setdefault(match[1].lower(), value)
+    return attrs
+
+
+def iter_typed_scripts(html):
+    # (attrs, body bytes) for every <script> that declares a type
+    if isinstance(html, str):
+        html = html.encode()
+    for match in SCRIPT_PATTERN.finditer(html):
+        raw_attrs = match[1]
+        if b'type' not in raw_attrs.lower():
+            continue
+        yield parse_attrs(raw_attrs), match[2]
+
+
+def fast_scripts(html):
+    ld_json = None
+    compressed = []
+    for attrs, body in iter_typed_scripts(html):
+        script_type = attrs.get(b'type')
+        if script_type == LD_JSON_TYPE:
+            if ld_json is None:
+                ld_json = body.decode('utf-8', 'replace')
+        elif script_type == JAVASCRIPT_TYPE and attrs.get(b'data-compress') == b'true' and body:
+            compressed.append(body.decode('utf-8', 'replace'))
+    return ld_json, compressed
+
+
+def find_ld_json(html):
+    # every parseable JSON-LD block, flattening top-level arrays and @graph lists
+    found = []
+    for attrs, body in iter_typed_scripts(html):
+        if attrs.get(b'type') != LD_JSON_TYPE:
+            continue
+        try:
+            data = json.loads(body)
+        except ValueError:
+            continue
+        items = data if isinstance(data, list) else [data]
+        for item in items:
+            if isinstance(item, dict) and isinstance(item.get("@graph"), list):
+                found.extend(node for node in item["@graph"] if isinstance(node, dict))
+            elif isinstance(item, dict):
+                found.append(item)
+    return found
+
+
+TAG_PATTERN = re.compile(rb'<[^>]*>')
+
+
+@lru_cache(maxsize=32)
+def class_pattern(class_name):
+    name = re.escape(class_name.encode())
+    return re.compile(
+        rb'<([a-zA-Z][\w-]*)\b[^>]*\bclass\s*=\s*["\'][^"\']*(?<![\w-])' + name + rb'(?![\w-])[^"\']*["\'][^>]*>(.*?)</\1\s*>',
+        re.DOTALL,
+    )
+
+
+def find_element_text(html, class_name):
+    # text of the first element carrying `class_name`, tags stripped and entities decoded
+    if isinstance(html, str):
+        html = html.encode()
+    match = class_pattern(class_name).search(html)
+    if match is None:
+        return None
+    text = unescape(TAG_PATTERN.sub(b'', match[2]).decode('utf-8', 'replace')).strip()
+    return text or None
+
+
+def bs4_scripts(html):
+    # imported on first use: bs4 is only the fallback and costs ~80ms of a cold start
+    from bs4 import BeautifulSoup
+    soup = BeautifulSoup(html, 'html.parser')
+    product_script = soup.find('script', {'type': 'application/ld+json'})
+    script_tags = soup.findAll('script', {'data-compress': 'true', 'type': 'text/javascript'})
+    ld_json = product_script.string if product_script else None
+    return ld_json, [script_tag.string for script_tag in script_tags if script_tag.string]
+
+
+def lxml_scripts(html):
+    tree = lxml.html.fromstring(html)
+    ld_json = tree.xpath('//script[@type="application/ld+json"][1]/text()')
+    compressed = tree.xpath('//script[@data-compress="true"][@type="text/javascript"]/text()')
+    return (ld_json[0] if ld_json else None), [str(script) for script in compressed if script]
+
+
+def selectolax_scripts(html):
+    tree = HTMLParser(html)
+    product_script = tree.css_first('script[type="application/ld+json"]')
+    script_tags = tree.css('script[data-compress="true"][type="text/javascript"]')
+    ld_json = product_script.text(deep=False) if product_script else None
+    return ld_json, [text for text in (script_tag.text(deep=False) for script_tag in script_tags) if text]
+
+
+BACKENDS = {"fast": fast_scripts, "bs4": bs4_scripts}
+if lxml is not None:
+    BACKENDS["lxml"] = lxml_scripts
+if HTMLParser is not None:
+    BACKENDS["selectolax"] = selectolax_scripts
+
+
+def extract_scripts(html, parser=None):
+    # Returns (ld+json text or None, [viewPayload script texts])
+    name = parser or PARSER
+    backend = BACKENDS.get(name, fast_scripts)
+    if isinstance(html, memoryview) and backend is not fast_scripts:
+        # a shared-memory page is only read in place by the regex pass
+        html = bytes(html)
+    ld_json, compressed = backend(html)
+    if (ld_json is None or not compressed) and backend is not bs4_scripts:
+        current_trace().set("parsePath", f"{name}>bs4")
+        return bs4_scripts(bytes(html) if isinstance(html, memoryview) else html)
+    current_trace().set("parsePath", name)
+    return ld_json, compressed
+
+
+VIEW_PAYLOAD_ASSIGNMENT = re.compile(r'window\.zara\.viewPayload\s*=\s*')
+payload_decoder = json.JSONDecoder()
+
+
+class TruncatedPayloadError(ValueError):
+    pass
+
+
+def extract_view_payload(script_content):
+    # raw_decode parses exactly one JSON value starting right after the assignment,
+    # so `};` inside strings and large payloads cost a single linear pass.
+    match = VIEW_PAYLOAD_ASSIGNMENT.search(script_content)
+    if match is None:
+        return None
+    try:
+        view_payload, _ = payload_decoder.raw_decode(script_content, match.end())
+    except json.JSONDecodeError as e:
+        raise TruncatedPayloadError(f"Truncated or invalid viewPayload: {e}")
+    return view_payload
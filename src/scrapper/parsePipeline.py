@@ -0,0 +1,127 @@
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+from multiprocessing.shared_memory import SharedMemory
+from queue import Queue
+import json
+import os
+
+from pageCache import UNCHANGED, payload_digest
+from pageParser import extract_scripts, extract_view_payload
+from productModel import Product, Color
+from tracing import Trace, current_trace, state
+
+PARSE_PROCESSES = int(os.environ.get("SCRAPER_PARSE_PROCESSES", str(max((os.cpu_count() or 1) - 1, 0))))
+PARSE_SLOTS = int(os.environ.get("SCRAPER_PARSE_SLOTS", "16"))
+SLOT_BYTES = int(os.environ.get("SCRAPER_PARSE_SLOT_KB", "1024")) * 1024
+
+# Parse stage for the two-stage batch pipeline: fetcher threads hand raw page
+# bytes to a pool of parser processes, which return Product records. Pages go
+# through a fixed set of shared-memory slots created once with the pool, so a
+# page is copied once into its slot and parsed in place by the worker instead of
+# being pickled through a pipe. The free slots are the bounded queue between the
+# stages: a fetcher waits for a slot when every parser is behind, which keeps
+# at most PARSE_SLOTS pages in flight. Pages larger than a slot are pickled.
+#
+# SCRAPER_PARSE_PROCESSES defaults to one less than the CPU count, leaving a
+# core for the fetchers; 0 (the default on a single core) parses in the
+# fetching thread as before.
+
+# shared-memory slots, attached once in each parser process
+slots = []
+
+
+def parse_product_page(html, created, with_digest=False, unchanged=None):
+    # Returns (product, payload digest or None). `unchanged(digest)` lets the
+    # caller stop before the product is built: UNCHANGED is returned when it is true
+    trace = current_trace()
+    product_script, script_tags = extract_scripts(html)
+    trace.lap("scripts")
+    links = {}
+    if product_script:
+        json_array = json.loads(product_script)
+        for item in json_array:
+            color_name = item["color"]
+            if color_name not in links:
+                links[color_name] = (item["image"], item["offers"]["url"])
+    else:
+        raise ValueError("No JSON-LD script tag found")
+    trace.lap("ldJson")
+    digest = None
+    product = Product("", created)
+    if script_tags:
+        for script_content in script_tags:
+            json_obj = extract_view_payload(script_content)
+            trace.lap("viewPayload")
+            if json_obj is None:
+                continue
+            if "product" in json_obj and "detail" in json_obj["product"]:
+                if with_digest:
+                    digest = payload_digest(json_obj["product"])
+                    if unchanged is not None and unchanged(digest):
+                        trace.set("unchanged", "digest")
+                        return UNCHANGED
+                    trace.lap("cache")
+                product.name = json_obj["product"]["name"]
+                product.colors = [
+                    Color.from_payload(color, created)
+                    for color in json_obj["product"]["detail"]["colors"]
+                ]
+                # the product payload is parsed once, later scripts are not scanned
+                break
+    else:
+        raise ValueError("No matching script tag found")
+    for color in product.colors:
+        color.link = links.get(color.name)
+    trace.lap("assemble")
+    return product, digest
+
+
+def attach(names):
+    slots.extend(SharedMemory(name) for name in names)
+
+
+def run_parse(html, created, with_digest, stored_digest, traced):
+    # In a parser process: (result, trace phases, trace counters). The phases
+    # and counters are only recorded when the scrape asking for it is traced;
+    # the result is UNCHANGED when the payload digest is `stored_digest`
+    trace = Trace(None) if traced else None
+    state.trace = trace
+    unchanged = (lambda digest: digest == stored_digest) if stored_digest else None
+    try:
+        result = parse_product_page(html, created, with_digest, unchanged)
+    finally:
+        state.trace = None
+    return result, (trace.phases if trace else {}), (trace.counters if trace else {})
+
+
+def parse_slot(index, size, created, with_digest, stored_digest, traced):
+    with slots[index].buf[:size] as html:
+        return run_parse(html, created, with_digest, stored_digest, traced)
+
+
+class ParsePool:
+    def __init__(self, processes=None, slot_count=None, slot_bytes=None):
+        self.slot_bytes = slot_bytes or SLOT_BYTES
+        self.blocks = [SharedMemory(create=True, size=self.slot_bytes) for _ in range(slot_count or PARSE_SLOTS)]
+        self.free = Queue()
+        for index in range(len(self.blocks)):
+            self.free.put(index)
+        # the pool starts from fetcher threads, which a forked child must not inherit
+        self.executor = ProcessPoolExecutor(processes or PARSE_PROCESSES or 1, get_context("forkserver"),
+                                            initializer=attach, initargs=([block.name for block in self.blocks],))
+
+    def submit(self, html, created, with_digest=False, stored_digest=None, traced=False):
+        # Returns a Future of run_parse()'s result; blocks while every slot is taken
+        if len(html) > self.slot_bytes:
+            return self.executor.submit(run_parse, html, created, with_digest, stored_digest, traced)
+        index = self.free.get()
+        self.blocks[index].buf[:len(html)] = html
+        future = self.executor.submit(parse_slot, index, len(html), created, with_digest, stored_digest, traced)
+        future.add_done_callback(lambda _: self.free.put(index))
+        return future
+
+    def close(self):
+        self.executor.shutdown()
+        for block in self.blocks:
+            block.close()
+            block.unlink()
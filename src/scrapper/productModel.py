@@ -0,0 +1,172 @@
+import sys
+
+# Slotted records for a scraped product. They hold the same data as the nested
+# dicts the scrapers used to build, with no per-object __dict__, and interned
+# availability strings. to_dict() rebuilds the exact JSON shape (key order
+# included) that buildZaraProduct on the Node side reads:
+#
+#   {"name", "created", "colors": [{"name", "created", "hexCode", "sizes": [
+#       {"created", "name", "availability", "oldPrice", "price", "discountPercentage",
+#        "futurePrice": {"price", "discountPercentage", "description"}}],
+#     "image", "url"}]}
+#
+# Optional fields are left out when missing or null, as before.
+
+# (attribute, payload/JSON key), in output order
+SIZE_FIELDS = (
+    ("name", "name"),
+    ("availability", "availability"),
+    ("old_price", "oldPrice"),
+    ("price", "price"),
+    ("discount_percentage", "discountPercentage"),
+)
+FUTURE_PRICE_FIELDS = (
+    ("price", "price"),
+    ("discount_percentage", "discountPercentage"),
+    ("description", "description"),
+)
+
+
+def optional_fields(record, fields):
+    result = {}
+    for attribute, key in fields:
+        value = getattr(record, attribute)
+        if value is not None:
+            result[key] = value
+    return result
+
+
+class FuturePrice:
+    __slots__ = tuple(attribute for attribute, _ in FUTURE_PRICE_FIELDS)
+
+    def __init__(self, price=None, discount_percentage=None, description=None):
+        self.price = price
+        self.discount_percentage = discount_percentage
+        self.description = description
+
+    @classmethod
+    def from_payload(cls, future_price):
+        return cls(*map(future_price.get, (key for _, key in FUTURE_PRICE_FIELDS)))
+
+    # to_dict() keeps the payload keys
+    from_dict = from_payload
+
+    def to_dict(self):
+        return optional_fields(self, FUTURE_PRICE_FIELDS)
+
+
+class Size:
+    __slots__ = ("created",) + tuple(attribute for attribute, _ in SIZE_FIELDS) + ("future_price",)
+
+    def __init__(self, created, name=None, availability=None, old_price=None, price=None,
+                 discount_percentage=None, future_price=None):
+        self.created = created
+        self.name = name
+        self.availability = sys.intern(availability) if availability is not None else None
+        self.old_price = old_price
+        self.price = price
+        self.discount_percentage = discount_percentage
+        self.future_price = future_price
+
+    @classmethod
+    def from_payload(cls, size, created):
+        future_price = size.get("futurePrice")
+        return cls(
+            created,
+            *map(size.get, (key for _, key in SIZE_FIELDS)),
+            FuturePrice.from_payload(future_price) if future_price is not None else None,
+        )
+
+    @classmethod
+    def from_dict(cls, size):
+        return cls.from_payload(size, size["created"])
+
+    def to_dict(self):
+        result = {"created": self.created}
+        result.update(optional_fields(self, SIZE_FIELDS))
+        if self.future_price is not None:
+            result["futurePrice"] = self.future_price.to_dict()
+        return result
+
+
+class Color:
+    __slots__ = ("name", "created", "hex_code", "sizes", "link")
+
+    def __init__(self, name, created, hex_code, sizes=None):
+        self.name = name
+        self.created = created
+        self.hex_code = hex_code
+        self.sizes = sizes if sizes is not None else []
+        # (image, url) from the JSON-LD offers, None when the color has no offer
+        self.link = None
+
+    @classmethod
+    def from_payload(cls, color, created):
+        return cls(color["name"], created, color["hexCode"], [Size.from_payload(size, created) for size in color["sizes"]])
+
+    @classmethod
+    def from_dict(cls, color):
+        result = cls(color["name"], color["created"], color.get("hexCode"), [Size.from_dict(size) for size in color["sizes"]])
+        if "image" in color or "url" in color:
+            result.link = (color.get("image"), color.get("url"))
+        return result
+
+    def to_dict(self):
+        result = {
+            "name": self.name,
+            "created": self.created,
+            "hexCode": self.hex_code,
+            "sizes": [size.to_dict() for size in self.sizes],
+        }
+        if self.link is not None:
+            result["image"], result["url"] = self.link
+        return result
+
+
+class Product:
+    __slots__ = ("name", "created", "colors", "url")
+
+    def __init__(self, name, created, colors=None):
+        self.name = name
+        self.created = created
+        self.colors = colors if colors is not None else []
+        # only set by category crawls, which attach the product page URL
+        self.url = None
+
+    @classmethod
+    def from_dict(cls, product):
+        # the inverse of to_dict(), for records stored as JSON
+        result = cls(product["name"], product["created"], [Color.from_dict(color) for color in product["colors"]])
+        result.url = product.get("url")
+        return result
+
+    def to_dict(self):
+        result = {
+            "name": self.name,
+            "created": self.created,
+            "colors": [color.to_dict() for color in self.colors],
+        }
+        if self.url is not None:
+            result["url"] = self.url
+        return result
+
+    def copy(self):
+        # a deep copy, for a consumer of a shared product that may change it
+        return Product.from_dict(self.to_dict())
+
+    def restamped(self, created):
+        # a copy observed again at `created`, for a page that has not changed
+        product = self.copy()
+        product.created = created
+        for color in product.colors:
+            color.created = created
+            for size in color.sizes:
+                size.created = created
+        return product
+
+
+def to_json(value):
+    # `default` hook for json.dumps, so results holding records serialize as before
+    if isinstance(value, Product):
+        return value.to_dict()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
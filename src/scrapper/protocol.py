@@ -0,0 +1,74 @@
+import sys
+
+from pageCache import UNCHANGED
+from retryPolicy import classify, CHALLENGE, BLOCK, NETWORK, PARSE, GONE, DEADLINE_EXCEEDED
+
+# Framed NDJSON output (`--ndjson`, and always in `--worker` mode): one JSON
+# record per line on stdout, logs on stderr. Every record carries the protocol
+# version, a type and an HTTP-like status:
+#
+#   {"v": 1, "type": "product",   "status": 200, "ok": true,  "id": I, "url": U, "product": {...}}
+#   {"v": 1, "type": "delta",     "status": 200, "ok": true,  "id": I, "url": U, "delta": {...}}
+#   {"v": 1, "type": "unchanged", "status": 304, "ok": true,  "id": I, "url": U}
+#   {"v": 1, "type": "error",     "status": S,   "ok": false, "id": I, "url": U, "kind": K, "error": E}
+#   {"v": 1, "type": "end",       "status": 200, "count": N, "failed": F}
+#
+# Error statuses: 400 bad job, 404 product gone, 422 parse, 429 blocked,
+# 502 network, 503 challenge, 504 deadline, 500 anything else. "end" closes a
+# CLI run, so a reader can tell a finished stream from a killed process; the
+# worker sends none.
+
+PROTOCOL_VERSION = 1
+FAILED = "Failed to extract product information."
+
+STATUS_BY_KIND = {
+    GONE: 404,
+    PARSE: 422,
+    BLOCK: 429,
+    NETWORK: 502,
+    CHALLENGE: 503,
+    DEADLINE_EXCEEDED: 504,
+}
+
+
+def record(record_type, status, job_id=None, url=None, **fields):
+    return {"v": PROTOCOL_VERSION, "type": record_type, "status": status, "ok": status < 400,
+            "id": job_id, "url": url, **fields}
+
+
+def error_record(job_id, url, status, error, kind=None):
+    return record("error", status, job_id, url, kind=kind, error=error)
+
+
+def end_record(count, failed):
+    return {"v": PROTOCOL_VERSION, "type": "end", "status": 200, "count": count, "failed": failed}
+
+
+def result_record(job_id, url, result, delta=False):
+    if result is None:
+        return error_record(job_id, url, 500, FAILED)
+    if result is UNCHANGED:
+        return record("unchanged", 304, job_id, url)
+    if delta:
+        return record("delta", 200, job_id, url, delta=result)
+    return record("product", 200, job_id, url, product=result)
+
+
+def failure_record(job_id, url, error):
+    # the error goes to stderr, its classification into the record
+    kind = classify(error)
+    print(f"Error occurred: {error}", file=sys.stderr)
+    return error_record(job_id, url, STATUS_BY_KIND.get(kind, 500), str(error), kind)
+
+
+def scrape(extract, url, job_id=None, **options):
+    # Runs one scrape and always returns a record
+    if not url:
+        return error_record(job_id, url, 400, "url is required")
+    if not isinstance(url, str):
+        return error_record(job_id, None, 400, f"Invalid job: url must be a string, got {type(url).__name__}")
+    try:
+        result = extract(url, raise_errors=True, **options)
+    except Exception as e:
+        return failure_record(job_id, url, e)
+    return result_record(job_id, url, result, options.get("delta", False))
@@ -0,0 +1,121 @@
+from threading import Lock
+import os
+import random
+import time
+
+PROXY_COOLDOWN = float(os.environ.get("SCRAPER_PROXY_COOLDOWN", "60"))
+PROXY_MAX_FAILURES = int(os.environ.get("SCRAPER_PROXY_MAX_FAILURES", "3"))
+MAX_COOLDOWN = 600
+
+# Proxy endpoints come from SCRAPER_PROXY_FILE (one URL per line, `#` comments allowed)
+# or from SCRAPER_PROXIES (comma separated). Each proxy keeps exponentially weighted
+# latency, error and challenge rates; selection is random weighted by score, and a
+# proxy that fails PROXY_MAX_FAILURES times in a row sits out a growing cooldown.
+
+
+def load_proxies():
+    path = os.environ.get("SCRAPER_PROXY_FILE")
+    if path:
+        with open(path) as f:
+            lines = (line.split("#", 1)[0].strip() for line in f)
+            return [line for line in lines if line]
+    return [proxy.strip() for proxy in os.environ.get("SCRAPER_PROXIES", "").split(",") if proxy.strip()]
+
+
+class ProxyStats:
+    __slots__ = ("latency", "error_rate", "challenge_rate", "requests", "errors", "challenges",
+                 "consecutive_failures", "cooldown_until")
+
+    def __init__(self):
+        self.latency = None
+        self.error_rate = 0.0
+        self.challenge_rate = 0.0
+        self.requests = 0
+        self.errors = 0
+        self.challenges = 0
+        self.consecutive_failures = 0
+        self.cooldown_until = 0.0
+
+
+class ProxyPool:
+    def __init__(self, endpoints, alpha=0.2, cooldown=None, max_failures=None):
+        self.endpoints = list(endpoints)
+        self.alpha = alpha
+        self.cooldown = PROXY_COOLDOWN if cooldown is None else cooldown
+        self.max_failures = PROXY_MAX_FAILURES if max_failures is None else max_failures
+        self.stats = {proxy: ProxyStats() for proxy in self.endpoints}
+        self.lock = Lock()
+
+    @classmethod
+    def from_config(cls):
+        return cls(load_proxies())
+
+    def score(self, stats, default_latency):
+        latency = stats.latency if stats.latency is not None else default_latency
+        health = (1 - stats.error_rate) * (1 - 0.5 * stats.challenge_rate)
+        return max(health, 0.01) / max(latency, 0.001)
+
+    def acquire(self, exclude=()):
+        if not self.endpoints:
+            raise ValueError("No proxies configured, set SCRAPER_PROXIES or SCRAPER_PROXY_FILE")
+        now = time.monotonic()
+        with self.lock:
+            available = [proxy for proxy in self.endpoints if self.stats[proxy].cooldown_until <= now]
+            # `exclude` holds proxies the caller already tried, skipped unless nothing else is left
+            untried = [proxy for proxy in available if proxy not in exclude]
+            available = untried or available
+            if not available:
+                # everything is cooling down, use whichever comes back first
+                return min(self.endpoints, key=lambda proxy: self.stats[proxy].cooldown_until)
+            known = [self.stats[proxy].latency for proxy in available if self.stats[proxy].latency is not None]
+            # untried proxies are scored optimistically so every endpoint gets sampled
+            default_latency = min(known) if known else 1.0
+            weights = [self.score(self.stats[proxy], default_latency) for proxy in available]
+            return random.choices(available, weights=weights)[0]
+
+    def record_success(self, proxy, latency, challenged=False):
+        with self.lock:
+            stats = self.stats.get(proxy)
+            if stats is None:
+                return
+            a = self.alpha
+            stats.requests += 1
+            stats.latency = latency if stats.latency is None else (1 - a) * stats.latency + a * latency
+            stats.error_rate = (1 - a) * stats.error_rate
+            stats.challenge_rate = (1 - a) * stats.challenge_rate + (a if challenged else 0)
+            if challenged:
+                stats.challenges += 1
+            stats.consecutive_failures = 0
+
+    def record_failure(self, proxy, latency=None):
+        with self.lock:
+            stats = self.stats.get(proxy)
+            if stats is None:
+                return
+            a = self.alpha
+            stats.requests += 1
+            stats.errors += 1
+            stats.error_rate = (1 - a) * stats.error_rate + a
+            if latency is not None:
+                stats.latency = latency if stats.latency is None else (1 - a) * stats.latency + a * latency
+            stats.consecutive_failures += 1
+            if stats.consecutive_failures >= self.max_failures:
+                excess = stats.consecutive_failures - self.max_failures
+                stats.cooldown_until = time.monotonic() + min(self.cooldown * 2 ** excess, MAX_COOLDOWN)
+
+    def metrics(self):
+        now = time.monotonic()
+        with self.lock:
+            return [
+                {
+                    "proxy": proxy,
+                    "latency": stats.latency,
+                    "errorRate": round(stats.error_rate, 4),
+                    "challengeRate": round(stats.challenge_rate, 4),
+                    "requests": stats.requests,
+                    "errors": stats.errors,
+                    "challenges": stats.challenges,
+                    "coolingDown": stats.cooldown_until > now,
+                }
+                for proxy, stats in self.stats.items()
+            ]
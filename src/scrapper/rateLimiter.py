@@ -0,0 +1,119 @@
+from threading import Lock
+import os
+import time
+
+RATE = float(os.environ.get("SCRAPER_RATE", "2"))
+MIN_RATE = float(os.environ.get("SCRAPER_MIN_RATE", "0.2"))
+MAX_RATE = float(os.environ.get("SCRAPER_MAX_RATE", "10"))
+BURST = float(os.environ.get("SCRAPER_BURST", "4"))
+
+# Token bucket per (host, proxy) whose refill rate adapts AIMD-style: every clean
+# response adds a little rate back, a challenge trims it, and a 403, 429, 5xx or
+# a challenge that verifying did not clear halves it. Pacing the requests
+# ourselves keeps us out of the Retry adapter's backoff.
+#
+# A scrape never takes a token it could only use after its deadline: reserve()
+# and acquire() take a limit and leave the bucket alone when the wait is longer.
+# admit() never borrows ahead, so new scrapes queue behind the running ones.
+
+OK = "ok"
+CHALLENGE = "challenge"
+THROTTLED = "throttled"
+ERROR = "error"
+
+DECREASE = {CHALLENGE: 0.8, THROTTLED: 0.5, ERROR: 0.5}
+
+
+class TokenBucket:
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.lock = Lock()
+
+    def refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def reserve(self, limit=None):
+        # takes a token, possibly going negative, and returns how long to wait
+        # for it; None, taking nothing, when that is longer than `limit` seconds
+        with self.lock:
+            self.refill(time.monotonic())
+            delay = max(0.0, (1 - self.tokens) / self.rate)
+            if limit is not None and delay > limit:
+                return None
+            self.tokens -= 1
+            return delay
+
+    def admit(self):
+        # takes a token and returns 0 when one is free now, otherwise takes
+        # nothing and returns how long until one is
+        with self.lock:
+            self.refill(time.monotonic())
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return 0.0
+            return (1 - self.tokens) / self.rate
+
+    def acquire(self, limit=None):
+        delay = self.reserve(limit)
+        if delay:
+            time.sleep(delay)
+        return delay
+
+
+class AdaptiveRateLimiter:
+    def __init__(self, rate=None, min_rate=None, max_rate=None, burst=None, increase=0.1):
+        self.rate = RATE if rate is None else rate
+        self.min_rate = MIN_RATE if min_rate is None else min_rate
+        self.max_rate = MAX_RATE if max_rate is None else max_rate
+        self.burst = BURST if burst is None else burst
+        self.increase = increase
+        self.buckets = {}
+        self.lock = Lock()
+
+    def bucket(self, key):
+        with self.lock:
+            bucket = self.buckets.get(key)
+            if bucket is None:
+                bucket = TokenBucket(self.rate, self.burst)
+                self.buckets[key] = bucket
+            return bucket
+
+    def reserve(self, key, limit=None):
+        # for callers that wait themselves, e.g. with asyncio.sleep
+        return self.bucket(key).reserve(limit)
+
+    def admit(self, key):
+        return self.bucket(key).admit()
+
+    def acquire(self, key, limit=None):
+        return self.bucket(key).acquire(limit)
+
+    def record(self, key, outcome):
+        bucket = self.bucket(key)
+        with bucket.lock:
+            bucket.refill(time.monotonic())
+            if outcome == OK:
+                bucket.rate = min(self.max_rate, bucket.rate + self.increase)
+            else:
+                bucket.rate = max(self.min_rate, bucket.rate * DECREASE.get(outcome, 0.5))
+
+    def metrics(self):
+        with self.lock:
+            buckets = list(self.buckets.items())
+        return [{"key": "|".join(str(part) for part in key), "rate": round(bucket.rate, 3)} for key, bucket in buckets]
+
+
+def classify_status(status_code):
+    # Zara answers a blocked client with 403 as often as with 429
+    if status_code in (403, 429):
+        return THROTTLED
+    if status_code >= 500:
+        return ERROR
+    return OK
+
+
+rate_limiter = AdaptiveRateLimiter()
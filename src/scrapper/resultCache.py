@@ -0,0 +1,253 @@
+from collections import OrderedDict
+from threading import Event, Lock
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+import json
+import os
+import sqlite3
+import sys
+import time
+import uuid
+
+from pageCache import CACHE_DIR
+from productModel import Product
+from retryPolicy import DEADLINE, Deadline
+
+RESULT_TTL = float(os.environ.get("SCRAPER_RESULT_TTL", "60"))
+RESULT_CACHE_SIZE = int(os.environ.get("SCRAPER_RESULT_CACHE_SIZE", "1024"))
+RESULT_CACHE_DISK = os.environ.get("SCRAPER_RESULT_CACHE_DISK", "1") == "1"
+RESULT_STALE = float(os.environ.get("SCRAPER_RESULT_STALE", "86400"))
+
+# Scrape results shared by every consumer of a product URL. Schedules of
+# different users often track the same product, and each run used to fetch and
+# parse the page again; within RESULT_TTL seconds they now get the same result.
+#
+# Entries are keyed by normalized URL and hold (product, payload digest,
+# validators), so each consumer still gets its own unchanged/delta answer and
+# its own copy of the product. The memory tier is an LRU of RESULT_CACHE_SIZE
+# entries; the disk tier is a SQLite file next to the page cache, shared by
+# every scraper process on the host.
+#
+# An expired entry is kept RESULT_STALE more seconds. The scrape that refetches
+# the URL gets it and revalidates it: the request carries its ETag and
+# Last-Modified, and a 304 or an unchanged payload digest refreshes the entry
+# without building the product again.
+#
+# Concurrent scrapes of one URL are coalesced: in a process, the first one
+# fetches and the others wait for its result or its error. Across processes a
+# lease row in SQLite plays the same part; a process finding another one's lease
+# polls for the result until the lease expires, then fetches itself. The file
+# is in WAL mode, so lookups are not blocked by another process's write, and a
+# SQLite error only costs that scrape the cache: it fetches uncached. A waiter,
+# in or across processes, spends at most WAIT_SHARE of what is left of its
+# scrape deadline waiting and fetches itself with the rest. Failures are never
+# cached. SCRAPER_RESULT_TTL=0 turns the cache off.
+
+TRACKING_PREFIXES = ("utm_",)
+POLL_INTERVAL = 0.1
+WAIT_SHARE = 0.5
+
+
+def normalize_url(url):
+    # scheme and host are case-insensitive, query order and fragments do not
+    # change the page, tracking parameters are dropped
+    parts = urlsplit(url.strip())
+    query = sorted((key, value) for key, value in parse_qsl(parts.query, keep_blank_values=True)
+                   if not key.lower().startswith(TRACKING_PREFIXES))
+    return urlunsplit((parts.scheme.lower(), parts.netloc.lower(), parts.path or "/", urlencode(query), ""))
+
+
+class Flight:
+    # one in-process fetch, and the result or error its followers get
+    def __init__(self):
+        self.done = Event()
+        self.result = None
+        self.error = None
+
+
+class ResultCache:
+    def __init__(self, ttl=None, max_entries=None, path=None, disk=None):
+        self.ttl = RESULT_TTL if ttl is None else ttl
+        self.max_entries = max_entries or RESULT_CACHE_SIZE
+        disk = RESULT_CACHE_DISK if disk is None else disk
+        self.path = (path or os.path.join(CACHE_DIR, "results.sqlite")) if disk else None
+        self.entries = OrderedDict()
+        self.flights = {}
+        self.lock = Lock()
+        self.connection = None
+        self.db_lock = Lock()
+        # lease owner id of this process
+        self.owner = uuid.uuid4().hex
+
+    @property
+    def enabled(self):
+        return self.ttl > 0
+
+    def connect(self):
+        if self.connection is None:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            self.connection = sqlite3.connect(self.path, timeout=10, check_same_thread=False)
+            self.connection.execute("PRAGMA journal_mode=WAL")
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS results (url TEXT PRIMARY KEY, entry TEXT, stored_at REAL)")
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS leases (url TEXT PRIMARY KEY, owner TEXT, expires_at REAL)")
+        return self.connection
+
+    def get(self, key, stale=False):
+        # (product, digest, validators) stored less than ttl seconds ago, or
+        # None; with stale=True also an expired one kept for revalidation
+        now = time.time()
+        max_age = self.ttl + RESULT_STALE if stale else self.ttl
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                if now - entry[0] < max_age:
+                    self.entries.move_to_end(key)
+                    return entry[1]
+                if now - entry[0] >= self.ttl + RESULT_STALE:
+                    del self.entries[key]
+        if self.path is None:
+            return None
+        try:
+            with self.db_lock:
+                row = self.connect().execute(
+                    "SELECT entry, stored_at FROM results WHERE url = ? AND stored_at > ?", (key, now - max_age),
+                ).fetchone()
+        except sqlite3.Error as e:
+            self.disk_failed(e)
+            return None
+        if row is None:
+            return None
+        data = json.loads(row[0])
+        result = (Product.from_dict(data["product"]), data["digest"], data["validators"])
+        self.remember(key, row[1], result)
+        return result
+
+    def remember(self, key, stored_at, result):
+        with self.lock:
+            self.entries[key] = (stored_at, result)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def put(self, key, result):
+        stored_at = time.time()
+        self.remember(key, stored_at, result)
+        if self.path is None:
+            return
+        product, digest, validators = result
+        entry = json.dumps({"product": product.to_dict(), "digest": digest, "validators": validators},
+                           ensure_ascii=False, separators=(",", ":"))
+        try:
+            with self.db_lock:
+                connection = self.connect()
+                connection.execute("INSERT OR REPLACE INTO results VALUES (?, ?, ?)", (key, entry, stored_at))
+                connection.execute("DELETE FROM results WHERE stored_at <= ?", (stored_at - self.ttl - RESULT_STALE,))
+                connection.commit()
+        except sqlite3.Error as e:
+            self.disk_failed(e)
+
+    def disk_failed(self, error):
+        print(f"Result cache unavailable, fetching uncached: {error}", file=sys.stderr)
+
+    def claim(self, key):
+        # True when this process now holds the fetch lease for `key`
+        now = time.time()
+        with self.db_lock:
+            connection = self.connect()
+            cursor = connection.execute(
+                "INSERT INTO leases VALUES (?, ?, ?) "
+                "ON CONFLICT (url) DO UPDATE SET owner = excluded.owner, expires_at = excluded.expires_at "
+                "WHERE leases.expires_at <= ?",
+                (key, self.owner, now + DEADLINE, now),
+            )
+            connection.commit()
+            return cursor.rowcount == 1
+
+    def release(self, key):
+        with self.db_lock:
+            connection = self.connect()
+            connection.execute("DELETE FROM leases WHERE url = ? AND owner = ?", (key, self.owner))
+            connection.commit()
+
+    def fetch_direct(self, key, fetch):
+        # `fetch(stale)` gets the expired entry to revalidate, or None
+        result = fetch(self.get(key, stale=True))
+        self.put(key, result)
+        return result
+
+    def fetch_shared(self, key, fetch, deadline):
+        # runs `fetch` under the disk lease, or waits for the process holding it
+        if self.path is None:
+            return self.fetch_direct(key, fetch)
+        give_up = time.monotonic() + deadline.remaining() * WAIT_SHARE
+        while True:
+            try:
+                if self.claim(key):
+                    break
+            except sqlite3.Error as e:
+                self.disk_failed(e)
+                return self.fetch_direct(key, fetch)
+            if time.monotonic() + POLL_INTERVAL > give_up:
+                return self.fetch_direct(key, fetch)
+            time.sleep(POLL_INTERVAL)
+            result = self.get(key)
+            if result is not None:
+                return result
+        try:
+            # another process may have stored it between the lookup and the claim
+            result = self.get(key)
+            if result is None:
+                result = self.fetch_direct(key, fetch)
+            return result
+        finally:
+            try:
+                self.release(key)
+            except sqlite3.Error as e:
+                # the lease still expires at its deadline
+                self.disk_failed(e)
+
+    def get_or_fetch(self, url, fetch, deadline=None):
+        # `fetch(stale)` returns (product, digest, validators), revalidating
+        # `stale` when it is not None; it runs at most once
+        # at a time per normalized URL, unless waiting would overrun `deadline`.
+        # Every caller gets its own copy of the product, which it may change
+        product, digest, validators = self.lookup_or_fetch(url, fetch, deadline)
+        return product.copy(), digest, validators
+
+    def lookup_or_fetch(self, url, fetch, deadline):
+        deadline = deadline or Deadline()
+        key = normalize_url(url)
+        result = self.get(key)
+        if result is not None:
+            return result
+        with self.lock:
+            flight = self.flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self.flights[key] = Flight()
+        if not leader:
+            if not flight.done.wait(deadline.remaining() * WAIT_SHARE):
+                return self.fetch_direct(key, fetch)
+            if flight.error is not None:
+                raise flight.error
+            return flight.result
+        try:
+            flight.result = self.fetch_shared(key, fetch, deadline)
+            return flight.result
+        except Exception as e:
+            flight.error = e
+            raise
+        finally:
+            with self.lock:
+                del self.flights[key]
+            flight.done.set()
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+        if self.path is not None:
+            with self.db_lock:
+                connection = self.connect()
+                connection.execute("DELETE FROM results")
+                connection.commit()
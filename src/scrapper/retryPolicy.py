@@ -0,0 +1,128 @@
+import json
+import os
+import random
+import time
+import requests
+
+try:
+    import httpx
+except ImportError:
+    httpx = None
+
+MAX_ATTEMPTS = int(os.environ.get("SCRAPER_MAX_ATTEMPTS", "3"))
+DEADLINE = float(os.environ.get("SCRAPER_DEADLINE", "45"))
+GET_TIMEOUT = float(os.environ.get("SCRAPER_GET_TIMEOUT", "10"))
+VERIFY_TIMEOUT = float(os.environ.get("SCRAPER_VERIFY_TIMEOUT", "5"))
+BACKOFF = float(os.environ.get("SCRAPER_BACKOFF", "0.5"))
+CONNECT_TIMEOUT = 3.05
+
+# One retry loop for a whole scrape instead of urllib3 retrying each request on
+# its own. Every phase (initial GET, verify POST, final GET) gets its own timeout,
+# capped by what is left of the scrape's deadline, and failures are classified so
+# only the ones another proxy could fix are retried.
+
+CHALLENGE = "challenge"  # the page was still a challenge after verifying
+BLOCK = "block"          # 403/429, this proxy is refused for now
+NETWORK = "network"      # timeouts, connection errors, 5xx
+PARSE = "parse"          # the page arrived but is not a product page
+GONE = "gone"            # 404/410, the product page no longer exists
+DEADLINE_EXCEEDED = "deadline"
+
+RETRYABLE = {CHALLENGE, BLOCK, NETWORK}
+
+
+class ScrapeError(Exception):
+    def __init__(self, kind, message, attempts=1):
+        super().__init__(message)
+        self.kind = kind
+        self.attempts = attempts
+
+    def __str__(self):
+        return f"{self.kind}: {super().__str__()} (after {self.attempts} attempt{'s' if self.attempts != 1 else ''})"
+
+
+class ChallengeFailed(ScrapeError):
+    def __init__(self, url):
+        super().__init__(CHALLENGE, f"still challenged after verifying {url}")
+
+
+class DeadlineExceeded(ScrapeError):
+    def __init__(self, phase):
+        super().__init__(DEADLINE_EXCEEDED, f"no time left for {phase}")
+
+
+class Deadline:
+    def __init__(self, seconds=None):
+        self.expires = time.monotonic() + (DEADLINE if seconds is None else seconds)
+
+    def remaining(self):
+        return self.expires - time.monotonic()
+
+    def timeout(self, phase, phase_timeout):
+        # (connect, read) timeout for one request, never past the deadline
+        remaining = self.remaining()
+        if remaining <= 0:
+            raise DeadlineExceeded(phase)
+        read = min(phase_timeout, remaining)
+        return (min(CONNECT_TIMEOUT, read), read)
+
+
+def status_kind(status):
+    if status in (403, 429):
+        return BLOCK
+    if status in (404, 410):
+        return GONE
+    return NETWORK if status >= 500 else PARSE
+
+
+def classify(error):
+    if isinstance(error, ScrapeError):
+        return error.kind
+    if isinstance(error, requests.HTTPError) and error.response is not None:
+        return status_kind(error.response.status_code)
+    if isinstance(error, requests.RequestException):
+        return NETWORK
+    if httpx is not None:
+        # the asyncio engine (asyncEngine.py) fetches with httpx
+        if isinstance(error, httpx.HTTPStatusError):
+            return status_kind(error.response.status_code)
+        if isinstance(error, httpx.HTTPError):
+            return NETWORK
+    if isinstance(error, (ValueError, json.JSONDecodeError, KeyError)):
+        return PARSE
+    return None
+
+
+def backoff(attempt):
+    # full jitter, so scrapes that failed together do not retry together
+    return random.uniform(0, BACKOFF * 2 ** attempt)
+
+
+def retry_delay(error, number, deadline, max_attempts):
+    # How long to wait before attempt `number` (1-based count of failures so
+    # far) after `error`. Errors that are not retryable, or the last one, are
+    # raised as ScrapeError.
+    kind = classify(error)
+    if kind is None:
+        raise error
+    delay = backoff(number - 1)
+    if kind not in RETRYABLE or number >= max_attempts or deadline.remaining() <= delay:
+        if isinstance(error, ScrapeError):
+            error.attempts = number
+            raise error
+        raise ScrapeError(kind, str(error), number) from error
+    return delay
+
+
+def run_with_retry(attempt, deadline=None, max_attempts=None):
+    # `attempt(number, deadline)` performs one try. Errors that are not
+    # retryable, or the last one, are raised as ScrapeError.
+    deadline = deadline or Deadline()
+    max_attempts = max_attempts or MAX_ATTEMPTS
+    number = 0
+    while True:
+        try:
+            return attempt(number, deadline)
+        except Exception as e:
+            number += 1
+            time.sleep(retry_delay(e, number, deadline, max_attempts))
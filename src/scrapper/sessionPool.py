@@ -0,0 +1,126 @@
+from http.cookies import SimpleCookie
+from threading import Lock
+from urllib.parse import urlsplit
+import os
+import requests
+from requests.adapters import BaseAdapter, HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+from urllib3.util.retry import Retry
+
+try:
+    import httpx
+    import h2  # noqa: F401  (httpx only negotiates HTTP/2 when h2 is installed)
+except ImportError:
+    httpx = None
+
+POOL_SIZE = int(os.environ.get("SCRAPER_POOL_SIZE", "10"))
+HTTP2 = os.environ.get("SCRAPER_HTTP2", "0") == "1"
+
+
+def parse_pool_sizes(value):
+    # "http://gate.smartproxy.com:10001=20,direct=4" -> {"http://gate.smartproxy.com:10001": 20, "direct": 4}
+    sizes = {}
+    for item in filter(None, (part.strip() for part in value.split(","))):
+        endpoint, _, size = item.rpartition("=")
+        sizes[endpoint] = int(size)
+    return sizes
+
+
+POOL_SIZES = parse_pool_sizes(os.environ.get("SCRAPER_POOL_SIZES", ""))
+
+
+class Http2Adapter(BaseAdapter):
+    # Transport adapter that sends requests through httpx so connections negotiate
+    # HTTP/2 with the origin, while callers keep using the requests.Session API.
+
+    def __init__(self, pool_size):
+        super().__init__()
+        self.limits = httpx.Limits(max_connections=pool_size, max_keepalive_connections=pool_size)
+        self.clients = {}
+        self.lock = Lock()
+
+    def get_client(self, proxy):
+        with self.lock:
+            client = self.clients.get(proxy)
+            if client is None:
+                client = httpx.Client(http2=True, proxy=proxy, limits=self.limits, follow_redirects=True)
+                self.clients[proxy] = client
+            return client
+
+    def send(self, request, stream=False, timeout=None, verify=True, cert=None, proxies=None):
+        proxy = (proxies or {}).get(urlsplit(request.url).scheme)
+        if isinstance(timeout, tuple):
+            timeout = httpx.Timeout(timeout[1], connect=timeout[0])
+        try:
+            r = self.get_client(proxy).request(
+                request.method, request.url, headers=dict(request.headers), content=request.body, timeout=timeout
+            )
+        except httpx.TimeoutException as e:
+            raise requests.Timeout(e, request=request)
+        except httpx.HTTPError as e:
+            raise requests.ConnectionError(e, request=request)
+
+        response = requests.Response()
+        response.status_code = r.status_code
+        response.reason = r.reason_phrase
+        response.headers = CaseInsensitiveDict(r.headers.multi_items())
+        response.url = str(r.url)
+        response.encoding = r.encoding
+        response.request = request
+        response._content = r.content
+        response._content_consumed = True
+        host = urlsplit(response.url).hostname
+        for header in r.headers.get_list("set-cookie"):
+            for morsel in SimpleCookie(header).values():
+                response.cookies.set(morsel.key, morsel.value, domain=morsel["domain"] or host, path=morsel["path"] or "/")
+        return response
+
+    def close(self):
+        with self.lock:
+            for client in self.clients.values():
+                client.close()
+            self.clients.clear()
+
+
+class SessionPool:
+    # One keep-alive session per egress endpoint (proxy URL, or "direct"), shared by
+    # every scrape in the process so TCP/TLS connections are reused across products.
+
+    def __init__(self, pool_size=None, pool_sizes=None, http2=None):
+        self.pool_size = pool_size or POOL_SIZE
+        self.pool_sizes = POOL_SIZES if pool_sizes is None else pool_sizes
+        self.http2 = (HTTP2 if http2 is None else http2) and httpx is not None
+        self.sessions = {}
+        self.lock = Lock()
+
+    def build_session(self, key):
+        size = self.pool_sizes.get(key, self.pool_size)
+        session = requests.Session()
+        if self.http2:
+            adapter = Http2Adapter(size)
+        else:
+            # one immediate reconnect for a stale pooled connection; anything slower
+            # is retried by retryPolicy, through another proxy and within the deadline
+            retries = Retry(total=1, read=False, status=False, backoff_factor=0)
+            adapter = HTTPAdapter(pool_connections=size, pool_maxsize=size, max_retries=retries)
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        return session
+
+    def get(self, proxy=None):
+        key = proxy or "direct"
+        with self.lock:
+            session = self.sessions.get(key)
+            if session is None:
+                session = self.build_session(key)
+                self.sessions[key] = session
+            return session
+
+    def close(self):
+        with self.lock:
+            for session in self.sessions.values():
+                session.close()
+            self.sessions.clear()
+
+
+session_pool = SessionPool()
@@ -0,0 +1,127 @@
+from threading import Lock
+import hashlib
+import json
+import os
+import sqlite3
+
+from pageCache import CACHE_DIR
+
+# Delta mode keeps the last snapshot each consumer received and emits only what
+# changed since then. Output (version 1):
+#
+#   {"v": 1, "type": "full", "digest": D, "product": {...}}             first run
+#   {"v": 1, "type": "delta", "base": B, "digest": D, "created": T,
+#    "name": N, "records": [...]}                                        later runs
+#
+# A consumer whose last digest is not `base` has missed a delta; passing the digest
+# it holds as `known_digest` makes the store answer with a full product instead.
+# Records are flat:
+#
+#   {"op": "add", "color": C, "hexCode": ..., "image": ..., "url": ...}
+#   {"op": "remove", "color": C}
+#   {"op": "update", "color": C, <changed color fields>}
+#   {"op": "add", "color": C, "size": S, <size fields>}
+#   {"op": "remove", "color": C, "size": S}
+#   {"op": "update", "color": C, "size": S, <changed size fields, null when dropped>}
+#
+# "name" is only present when the product name changed.
+
+DELTA_VERSION = 1
+COLOR_FIELDS = ("hexCode", "image", "url")
+SIZE_FIELDS = ("availability", "price", "oldPrice", "discountPercentage", "futurePrice")
+
+
+def normalize(product):
+    # `created` timestamps change on every scrape and are left out of snapshots
+    colors = {}
+    for color in product["colors"]:
+        entry = {field: color[field] for field in COLOR_FIELDS if field in color}
+        entry["sizes"] = {
+            size.get("name") or "": {field: size[field] for field in SIZE_FIELDS if field in size}
+            for size in color["sizes"]
+        }
+        colors[color["name"]] = entry
+    return {"name": product["name"], "colors": colors}
+
+
+def snapshot_digest(snapshot):
+    data = json.dumps(snapshot, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+    return hashlib.blake2b(data.encode(), digest_size=16).hexdigest()
+
+
+def changed_fields(old, new, fields):
+    return {field: new.get(field) for field in fields if old.get(field) != new.get(field)}
+
+
+def diff_snapshots(old, new):
+    records = []
+    for color_name, color in new["colors"].items():
+        old_color = old["colors"].get(color_name)
+        if old_color is None:
+            records.append({"op": "add", "color": color_name, **{k: v for k, v in color.items() if k != "sizes"}})
+            for size_name, size in color["sizes"].items():
+                records.append({"op": "add", "color": color_name, "size": size_name, **size})
+            continue
+
+        changes = changed_fields(old_color, color, COLOR_FIELDS)
+        if changes:
+            records.append({"op": "update", "color": color_name, **changes})
+        for size_name, size in color["sizes"].items():
+            old_size = old_color["sizes"].get(size_name)
+            if old_size is None:
+                records.append({"op": "add", "color": color_name, "size": size_name, **size})
+                continue
+            changes = changed_fields(old_size, size, SIZE_FIELDS)
+            if changes:
+                records.append({"op": "update", "color": color_name, "size": size_name, **changes})
+        for size_name in old_color["sizes"].keys() - color["sizes"].keys():
+            records.append({"op": "remove", "color": color_name, "size": size_name})
+
+    for color_name in old["colors"].keys() - new["colors"].keys():
+        records.append({"op": "remove", "color": color_name})
+    return records
+
+
+class SnapshotStore:
+    def __init__(self, path=None):
+        self.path = path or os.path.join(CACHE_DIR, "snapshots.sqlite")
+        self.connection = None
+        self.lock = Lock()
+
+    def connect(self):
+        if self.connection is None:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            self.connection = sqlite3.connect(self.path, timeout=10, check_same_thread=False)
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS snapshots (snapshot_key TEXT PRIMARY KEY, digest TEXT, data TEXT)"
+            )
+        return self.connection
+
+    def get(self, key):
+        with self.lock:
+            row = self.connect().execute(
+                "SELECT digest, data FROM snapshots WHERE snapshot_key = ?", (key,)
+            ).fetchone()
+        return (row[0], json.loads(row[1])) if row else (None, None)
+
+    def put(self, key, digest, snapshot):
+        data = json.dumps(snapshot, separators=(",", ":"), ensure_ascii=False)
+        with self.lock:
+            connection = self.connect()
+            connection.execute("INSERT OR REPLACE INTO snapshots VALUES (?, ?, ?)", (key, digest, data))
+            connection.commit()
+
+    def delta(self, key, product, known_digest=None):
+        snapshot = normalize(product)
+        digest = snapshot_digest(snapshot)
+        base, previous = self.get(key)
+        if base != digest:
+            self.put(key, digest, snapshot)
+
+        if previous is None or (known_digest is not None and known_digest != base):
+            return {"v": DELTA_VERSION, "type": "full", "digest": digest, "product": product}
+        delta = {"v": DELTA_VERSION, "type": "delta", "base": base, "digest": digest, "created": product["created"]}
+        if previous["name"] != snapshot["name"]:
+            delta["name"] = snapshot["name"]
+        delta["records"] = diff_snapshots(previous, snapshot) if base != digest else []
+        return delta
@@ -0,0 +1,63 @@
+import os
+import sys
+import tempfile
+import unittest
+
+# The price history a category crawl leaves behind: listing entries carry their
+# price and availability per color, and are recorded the way
+# ZaraEngine.record_listing does it.
+#
+#   python3 -m unittest discover -s src/scrapper/tests
+
+TESTS_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(TESTS_DIR))
+
+from categoryCrawler import crawl_category  # noqa: E402
+from historyStore import HistoryStore  # noqa: E402
+
+CATEGORY_URL = "https://www.zara.com/ar/es/mujer-l838.html"
+FIXTURE = os.path.join(os.path.dirname(TESTS_DIR), "benchmarks", "fixtures", "category.html")
+
+
+def fixture_listing(page_url):
+    # every page is the fixture page, so the crawl stops at page 2
+    with open(FIXTURE, "rb") as f:
+        return f.read()
+
+
+class CategoryHistoryTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.store = HistoryStore(self.directory.name)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def crawl(self):
+        products = list(crawl_category(CATEGORY_URL, fixture_listing))
+        for product in products:
+            self.store.record(product["url"], product)
+        return products
+
+    def test_crawl_records_one_series_per_listed_color(self):
+        products = self.crawl()
+        colors = [(product, color) for product in products for color in product["colors"]]
+        self.assertTrue(colors)
+
+        series = self.store.series()
+        self.assertEqual(len(series), len(colors))
+        self.assertEqual({size for _, _, _, size in series}, {""})
+        observations = self.store.observations([row[0] for row in series])
+        self.assertEqual(sum(len(rows) for rows in observations.values()), len(colors))
+
+    def test_listing_prices_survive_a_flush(self):
+        products = self.crawl()
+        self.store.flush(compact=False)
+        product = products[0]
+        history = self.store.price_history(product["url"])
+        self.assertEqual([(point["color"], point["size"], point["price"]) for point in history],
+                         [(color["name"], "", color["price"]) for color in product["colors"]])
+
+
+if __name__ == "__main__":
+    unittest.main()
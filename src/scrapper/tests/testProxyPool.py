@@ -0,0 +1,143 @@
+import os
+import random
+import shutil
+import socket
+import sys
+import tempfile
+import unittest
+
+# ProxyPool driven through real requests: the proxy transport of zara.py fetches
+# through local stand-in proxies (benchmarks/mockServer.py, which also works as
+# a plain HTTP proxy) that answer, answer slowly, fail, or refuse connections,
+# and through a healthy one for products that no longer exist.
+#
+#   python3 -m unittest discover -s src/scrapper/tests
+
+TESTS_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(TESTS_DIR))
+sys.path.insert(0, os.path.join(os.path.dirname(TESTS_DIR), "benchmarks"))
+
+CACHE_DIR = tempfile.mkdtemp()
+# before the scraper modules load: no pacing, no shared results between tests
+os.environ.update({
+    "SCRAPER_CACHE_DIR": CACHE_DIR,
+    "SCRAPER_RATE": "1000000",
+    "SCRAPER_MAX_RATE": "1000000",
+    "SCRAPER_BURST": "1000000",
+    "SCRAPER_RESULT_TTL": "0",
+})
+
+import requests  # noqa: E402
+
+import mockServer  # noqa: E402
+from proxyPool import ProxyPool  # noqa: E402
+from zaraEngine import ProxyPoolTransport  # noqa: E402
+
+# fetched through the proxy, so the host is never resolved
+PRODUCT_URL = "http://www.zara.com/ar/es/product-p05857165.html"
+GONE_URL = "http://www.zara.com/ar/es/missing-p09999999.html"
+
+
+def tearDownModule():
+    shutil.rmtree(CACHE_DIR, ignore_errors=True)
+
+
+def refused_route():
+    # a local port nothing listens on
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        port = probe.getsockname()[1]
+    return f"http://127.0.0.1:{port}"
+
+
+class ProxyPoolTest(unittest.TestCase):
+    def setUp(self):
+        self.servers = []
+
+    def tearDown(self):
+        for server in self.servers:
+            server.shutdown()
+            server.server_close()
+
+    def stand_in(self, **options):
+        server = mockServer.start(**options)
+        self.servers.append(server)
+        return mockServer.base_url(server)
+
+    def fetch(self, transport, route, times=1):
+        for _ in range(times):
+            transport.fetch(PRODUCT_URL, route)
+
+    def fail(self, transport, route, times, url=PRODUCT_URL):
+        for _ in range(times):
+            with self.assertRaises(requests.RequestException):
+                transport.fetch(url, route)
+
+    def test_failures_put_a_route_on_cooldown(self):
+        healthy, failing = self.stand_in(), self.stand_in(error_rate=1.0)
+        pool = ProxyPool([healthy, failing], cooldown=60, max_failures=2)
+        transport = ProxyPoolTransport(pool)
+        self.fetch(transport, healthy)
+
+        self.fail(transport, failing, 1)
+        self.assertFalse(self.cooling_down(pool)[failing])
+        self.fail(transport, failing, 1)
+        self.assertTrue(self.cooling_down(pool)[failing])
+        self.assertFalse(self.cooling_down(pool)[healthy])
+        self.assertEqual({pool.acquire() for _ in range(50)}, {healthy})
+        # even a retry that already tried the healthy route stays off the cooling one
+        self.assertEqual(pool.acquire(exclude={healthy}), healthy)
+
+    def test_gone_products_do_not_count_against_a_route(self):
+        healthy = self.stand_in()
+        pool = ProxyPool([healthy, refused_route()], cooldown=60, max_failures=2)
+        transport = ProxyPoolTransport(pool)
+        self.fail(transport, healthy, 3, url=GONE_URL)
+
+        metrics = {row["proxy"]: row for row in pool.metrics()}[healthy]
+        self.assertFalse(metrics["coolingDown"])
+        self.assertEqual(metrics["errors"], 0)
+        self.assertEqual(metrics["errorRate"], 0)
+
+    def test_success_resets_the_failure_count(self):
+        flaky = self.stand_in()
+        pool = ProxyPool([flaky, refused_route()], cooldown=60, max_failures=2)
+        transport = ProxyPoolTransport(pool)
+        pool.record_failure(flaky)
+        self.fetch(transport, flaky)
+        pool.record_failure(flaky)
+        self.assertFalse(self.cooling_down(pool)[flaky])
+
+    def test_best_scoring_healthy_route_is_picked(self):
+        fast, slow = self.stand_in(), self.stand_in(latency=0.2)
+        pool = ProxyPool([fast, slow], cooldown=60)
+        transport = ProxyPoolTransport(pool)
+        self.fetch(transport, fast, 2)
+        self.fetch(transport, slow, 2)
+
+        latency = {row["proxy"]: row["latency"] for row in pool.metrics()}
+        self.assertLess(latency[fast], latency[slow])
+        random.seed(1)
+        picks = [pool.acquire() for _ in range(200)]
+        self.assertGreater(picks.count(fast), 180)
+        # a retry goes to the route it has not tried yet
+        self.assertEqual(pool.acquire(exclude={fast}), slow)
+
+    def test_falls_back_when_every_route_cools_down(self):
+        first, second = refused_route(), refused_route()
+        pool = ProxyPool([first, second], cooldown=60, max_failures=1)
+        transport = ProxyPoolTransport(pool)
+        self.fail(transport, first, 1)
+        self.fail(transport, second, 1)
+
+        self.assertTrue(all(self.cooling_down(pool).values()))
+        # the route whose cooldown ends first
+        self.assertEqual(pool.acquire(), first)
+        self.assertEqual(pool.acquire(exclude={first}), first)
+
+    def cooling_down(self, pool):
+        return {row["proxy"]: row["coolingDown"] for row in pool.metrics()}
+
+
+if __name__ == "__main__":
+    unittest.main()
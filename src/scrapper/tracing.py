@@ -0,0 +1,152 @@
+from contextlib import contextmanager
+from functools import wraps
+from threading import Lock, local
+import cProfile
+import itertools
+import json
+import os
+import sys
+import time
+
+TRACE = os.environ.get("SCRAPER_TRACE", "")
+PROFILE_DIR = os.environ.get("SCRAPER_PROFILE_DIR", "")
+
+# Per-scrape timing trace. With SCRAPER_TRACE=stderr (or a file path) every scrape
+# writes one JSON line:
+#
+#   {"trace": "scrape", "url": U, "ok": true, "totalMs": 812.4,
+#    "phases": {"proxy": 0.1, "initialGet": 301.2, "initialGetTtfb": 280.0, ...},
+#    "counters": {"bytes": 126034, "proxy": P, "challengeSolved": true, "parsePath": "fast", ...}}
+#
+# Phases are milliseconds, summed when a phase runs more than once (retries).
+# SCRAPER_PROFILE_DIR additionally dumps a cProfile .prof file per scrape there.
+# Code that runs outside a traced scrape records into a no-op trace.
+
+write_lock = Lock()
+state = local()
+profile_sequence = itertools.count()
+
+
+class Trace:
+    def __init__(self, url):
+        self.url = url
+        self.started = time.perf_counter()
+        self.phases = {}
+        self.counters = {}
+        self.mark = self.started
+
+    @contextmanager
+    def phase(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - start)
+
+    def add(self, name, seconds):
+        self.phases[name] = self.phases.get(name, 0.0) + seconds * 1000
+
+    def lap(self, name=None):
+        # closes the phase running since the previous lap, for straight-line code
+        now = time.perf_counter()
+        if name:
+            self.add(name, now - self.mark)
+        self.mark = now
+
+    def count(self, name, amount=1):
+        self.counters[name] = self.counters.get(name, 0) + amount
+
+    def set(self, name, value):
+        self.counters[name] = value
+
+    def merge(self, phases, counters):
+        # phases and counters recorded by another process for this scrape
+        for name, ms in phases.items():
+            self.phases[name] = self.phases.get(name, 0.0) + ms
+        self.counters.update(counters)
+
+    def record(self, ok):
+        return {
+            "trace": "scrape",
+            "url": self.url,
+            "ok": ok,
+            "totalMs": round((time.perf_counter() - self.started) * 1000, 1),
+            "phases": {name: round(ms, 1) for name, ms in self.phases.items()},
+            "counters": self.counters,
+        }
+
+
+class NullTrace:
+    @contextmanager
+    def phase(self, name):
+        yield
+
+    def add(self, name, seconds):
+        pass
+
+    def lap(self, name=None):
+        pass
+
+    def count(self, name, amount=1):
+        pass
+
+    def set(self, name, value):
+        pass
+
+    def merge(self, phases, counters):
+        pass
+
+
+NULL_TRACE = NullTrace()
+
+
+def current_trace():
+    return getattr(state, "trace", None) or NULL_TRACE
+
+
+def write_trace(record, target=None):
+    target = target or TRACE
+    line = json.dumps(record, ensure_ascii=False) + "\n"
+    with write_lock:
+        if target == "stderr":
+            sys.stderr.write(line)
+            sys.stderr.flush()
+        else:
+            with open(target, "a", encoding="utf-8") as f:
+                f.write(line)
+
+
+def profile_path():
+    name = f"{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}-{next(profile_sequence)}.prof"
+    return os.path.join(PROFILE_DIR, name)
+
+
+def traced(extract):
+    # Wraps a scraper's extract(url, ...) so each call runs under its own trace
+    @wraps(extract)
+    def wrapper(url, *args, **kwargs):
+        if not TRACE and not PROFILE_DIR:
+            return extract(url, *args, **kwargs)
+        trace = Trace(url)
+        previous = getattr(state, "trace", None)
+        state.trace = trace
+        profiler = cProfile.Profile() if PROFILE_DIR else None
+        result = None
+        try:
+            if profiler:
+                try:
+                    profiler.enable()
+                except ValueError:
+                    # another profiler is active (e.g. a concurrent scrape on 3.12+)
+                    profiler = None
+            result = extract(url, *args, **kwargs)
+            return result
+        finally:
+            if profiler:
+                profiler.disable()
+                os.makedirs(PROFILE_DIR, exist_ok=True)
+                profiler.dump_stats(profile_path())
+            state.trace = previous
+            if TRACE:
+                write_trace(trace.record(bool(result)))
+    return wrapper
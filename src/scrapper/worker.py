@@ -0,0 +1,71 @@
+import json
+import sys
+
+from productModel import to_json
+from protocol import scrape, error_record, end_record
+
+# Resident worker loop: one JSON job per stdin line, one protocol record (see
+# protocol.py) per stdout line. A job is either a bare URL string or
+# {"id": ..., "url": ...}; the id is echoed back so the caller can match results
+# to jobs. A "cacheKey" lets the scraper remember
+# what that consumer last saw; with "ifChanged": true the product is then
+# {"unchanged": true} when nothing changed since. "delta": true returns a
+# snapshotStore delta instead of the full product; "knownDigest" is the digest of
+# the last delta the caller applied. {"cmd": "metrics"} returns the scraper's
+# runtime metrics (e.g. proxy health) instead of running a scrape.
+
+
+def write_result(stdout, result):
+    stdout.write(json.dumps(result, ensure_ascii=False, default=to_json) + "\n")
+    stdout.flush()
+
+
+def write_stream(stdout, records):
+    # NDJSON output for a CLI run: every record as it arrives, then the end frame
+    count = failed = 0
+    for record in records:
+        write_result(stdout, record)
+        count += 1
+        failed += not record["ok"]
+    write_result(stdout, end_record(count, failed))
+
+
+def job_options(job):
+    # scrape() options for a worker job; Lambda SQS messages use the same format
+    options = {}
+    if job.get("cacheKey"):
+        options["cache_key"] = job["cacheKey"]
+        options["if_changed"] = bool(job.get("ifChanged"))
+    if job.get("delta"):
+        options["delta"] = True
+        options["known_digest"] = job.get("knownDigest")
+    return options
+
+
+def run_worker(extract, stdin=None, stdout=None, metrics=None):
+    stdin = stdin or sys.stdin
+    stdout = stdout or sys.stdout
+
+    for line in stdin:
+        line = line.strip()
+        if not line:
+            continue
+
+        try:
+            job = json.loads(line)
+        except json.JSONDecodeError as e:
+            write_result(stdout, error_record(None, None, 400, f"Invalid job: {e}"))
+            continue
+
+        if isinstance(job, str):
+            job = {"url": job}
+        if not isinstance(job, dict):
+            write_result(stdout, error_record(None, None, 400, f"Invalid job: expected a URL or an object, got {type(job).__name__}"))
+            continue
+        if job.get("cmd") == "metrics":
+            write_result(stdout, {"id": job.get("id"), "ok": True, "metrics": metrics() if metrics else {}})
+            continue
+
+        # scrape() turns every failure into an error record, so a bad job never
+        # takes the worker down
+        write_result(stdout, scrape(extract, job.get("url"), job.get("id"), **job_options(job)))
@@ -1,127 +1,172 @@
-import requests
+from collections import defaultdict, deque
 import json
-from bs4 import BeautifulSoup
-import re
-
-def lambda_handler(event, context):
-    url = event.get('queryStringParameters', {}).get('url', None)
-
-    if url is None:
+import os
+import sys
+
+from batch import run_batch
+from protocol import scrape, error_record, STATUS_BY_KIND
+from retryPolicy import classify, RETRYABLE, DEADLINE_EXCEEDED
+from productModel import to_json
+from resultCache import ResultCache
+from worker import job_options
+from zaraEngine import ZaraEngine, DirectTransport, PASSED_HEADERS
+
+RESULT_QUEUE_URL = os.environ.get("SCRAPER_RESULT_QUEUE_URL")
+
+# AWS Lambda entry point on the shared engine. Everything expensive (sessions,
+# clearance cookies, compiled patterns, the SQS client) lives at module level, so
+# only a cold start pays for it and warm invocations reuse it.
+#
+# API Gateway / function URL:
+#   ?url=U          {"message": "script executed", "product": {...}}
+#   ?url=U&html=1   the final page HTML after the challenge, for LambdaTransport;
+#                   If-None-Match / If-Modified-Since are passed on to Zara
+#
+# SQS: every message body is a worker job (a URL, or {"id", "url", "cacheKey", ...}
+# as JSON). The batch runs on the batch.py thread pool and every result is a
+# protocol record, sent to SCRAPER_RESULT_QUEUE_URL when set and logged to stdout
+# as one NDJSON line otherwise. Messages that failed with a retryable error are
+# returned in batchItemFailures (enable ReportBatchItemFailures on the trigger),
+# so SQS redelivers only those; a gone or unparsable product is not retried.
+#
+# Every payload is compact JSON. benchmarks/lambdaSim.py runs the handler locally.
+#
+# A container handles one invocation at a time, so its result cache stays in
+# memory: warm invocations share it, there are no other processes to coordinate.
+engine = ZaraEngine(DirectTransport(), ResultCache(disk=False))
+result_queue = None
+if RESULT_QUEUE_URL:
+    # boto3 ships with the Lambda runtime but takes a while to import, so only
+    # functions that send results pay for it
+    import boto3
+    result_queue = boto3.client("sqs")
+
+COMPACT = {"ensure_ascii": False, "separators": (",", ":"), "default": to_json}
+REDELIVERED_KINDS = RETRYABLE | {DEADLINE_EXCEEDED}
+# SendMessageBatch takes at most 10 entries
+SEND_BATCH_SIZE = 10
+
+
+def request_headers(event):
+    headers = {name.lower(): value for name, value in (event.get('headers') or {}).items()}
+    conditional = {}
+    if headers.get('if-none-match'):
+        conditional['If-None-Match'] = headers['if-none-match']
+    if headers.get('if-modified-since'):
+        conditional['If-Modified-Since'] = headers['if-modified-since']
+    return conditional or None
+
+
+def page_response(event, url):
+    try:
+        r = engine.fetch_product_page(url, conditional=request_headers(event))
+    except Exception as e:
+        print(f"Error occurred: {e}", file=sys.stderr)
+        kind = classify(e)
         return {
-            'statusCode': 400,
-            'body': json.dumps({'error': 'url parameter is required'})
+            'statusCode': STATUS_BY_KIND.get(kind, 500),
+            'body': json.dumps({'error': str(e), 'kind': kind}, **COMPACT)
         }
-
-    site = 'https://www.zara.com'
-    sec  = site + '/_sec/verify?provider=interstitial'
-
-    headers = {
-      'User-Agent': (
-          'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 '
-          '(KHTML, like Gecko) Chrome/113.0.0.0 Safari/537.36'
-      ),
-      'Referer': url,
+    return {
+        'statusCode': r.status_code,
+        'headers': {name: r.headers[name] for name in PASSED_HEADERS if name in r.headers},
+        'body': r.text
     }
 
-    r = requests.get(url, headers=headers)
-
-    html = r.content
 
-    # extract `i`, `j` and `bm-verify`
-    i = re.search(rb'var i = (\d+)', html)[1]
-    j = re.search(rb'var j = i [+] Number[(]"(\d+)" [+] "(\d+)"[)]', html)
-    j = j[1] + j[2]
-
-    payload = {
-      'bm-verify': re.search(rb'"bm-verify"\s*:\s*"([^"]+)', html)[1].decode(),
-      'pow': int(i) + int(j)
+def product_response(url):
+    record = scrape(engine.extract_product_info, url)
+    if not record['ok']:
+        return {
+            'statusCode': record['status'],
+            'body': json.dumps({'error': record['error'], 'kind': record['kind']}, **COMPACT)
+        }
+    return {
+        'statusCode': 200,
+        'body': json.dumps({'message': 'script executed', 'product': record['product']}, **COMPACT)
     }
 
-    rr = requests.post(sec, cookies=r.cookies, json=payload, headers=headers)
-
-    rrr = requests.get(url, cookies=rr.cookies, headers=headers)
 
-    html = rrr.content
+def parse_message(message):
+    # the worker job carried by one SQS message, None when it has no URL
+    body = message.get('body') or ''
+    try:
+        job = json.loads(body)
+    except json.JSONDecodeError:
+        # a bare URL needs no JSON quoting
+        job = body.strip()
+    if isinstance(job, str):
+        job = {'url': job}
+    if not isinstance(job, dict) or not job.get('url'):
+        return None
+    job.setdefault('id', message.get('messageId'))
+    return job
+
+
+def run_jobs(messages):
+    # Yields (message id, record). run_batch hands back URLs, so messages are
+    # queued per URL and each scrape takes the next one for its URL; repeated
+    # URLs keep their own id and options
+    queued = defaultdict(deque)
+    urls = []
+    for message in messages:
+        job = parse_message(message)
+        if job is None:
+            yield message.get('messageId'), error_record(message.get('messageId'), None, 400, "Invalid job: url is required")
+            continue
+        queued[job['url']].append((message.get('messageId'), job))
+        urls.append(job['url'])
+
+    def run(url):
+        message_id, job = queued[url].popleft()
+        return message_id, scrape(engine.extract_product_info, url, job['id'], **job_options(job))
+
+    for _, result in run_batch(urls, run):
+        yield result
+
+
+def publish(results):
+    # Sends (message id, record) pairs on; returns the message ids whose record
+    # could not be sent, so SQS redelivers them
+    if result_queue is None:
+        for _, record in results:
+            print(json.dumps(record, **COMPACT))
+        return []
+    unsent = []
+    for start in range(0, len(results), SEND_BATCH_SIZE):
+        chunk = results[start:start + SEND_BATCH_SIZE]
+        response = result_queue.send_message_batch(QueueUrl=RESULT_QUEUE_URL, Entries=[
+            {'Id': str(n), 'MessageBody': json.dumps(record, **COMPACT)} for n, (_, record) in enumerate(chunk)
+        ])
+        unsent.extend(chunk[int(entry['Id'])][0] for entry in response.get('Failed', []))
+    return unsent
+
+
+def sqs_response(messages):
+    failures = []
+    delivered = []
+    for message_id, record in run_jobs(messages):
+        if not record['ok'] and record.get('kind') in REDELIVERED_KINDS:
+            failures.append(message_id)
+        else:
+            delivered.append((message_id, record))
+    failures.extend(publish(delivered))
+    return {'batchItemFailures': [{'itemIdentifier': message_id} for message_id in failures]}
 
-    soup = BeautifulSoup(html, 'html.parser')
 
-    product_script = soup.find('script', {'type': 'application/ld+json'})
-
-    links = {}
-
-    if product_script:
-        json_data = product_script.string
-        json_array = json.loads(json_data)
-
-        for item in json_array:
-            color_name = item["color"]
-            image_url = item["image"]
-            offer_url = item["offers"]["url"]
-
-            if color_name not in links:
-                links[color_name] = {
-                    "image": image_url,
-                    "url": offer_url
-                }
-    else:
-        print("No JSON-LD script tag found")
-
-    script_tags = soup.findAll('script', {'data-compress': 'true', 'type': 'text/javascript'})
+def lambda_handler(event, context):
+    if 'Records' in event:
+        return sqs_response(event['Records'])
 
-    product = {
-        "name": "",
-        "colors": []
-    }
+    params = event.get('queryStringParameters') or {}
+    url = params.get('url')
 
-    if script_tags:
-        for script_tag in script_tags:
-            script_content = script_tag.string
-
-            match = re.search(r'window\.zara\.viewPayload\s*=\s*(\{.*?\});', script_content, re.DOTALL)
-
-            if match:
-                view_payload = match.group(1)
-                try:
-                    json_obj = json.loads(view_payload)
-
-                    if "product" in json_obj and "detail" in json_obj["product"]:
-                        product["name"] = json_obj["product"]["name"]
-                        for color in json_obj["product"]["detail"]["colors"]:
-                            color_dict = {
-                                "name": color["name"],
-                                "hexCode": color["hexCode"],
-                                "sizes": []
-                            }
-                            for size in color["sizes"]:
-                                size_dict = {
-                                    "name": size["name"],
-                                    "availability": size["availability"],
-                                    "oldPrice": size["oldPrice"],
-                                    "price": size["price"],
-                                    "discountPercentage": size["discountPercentage"]
-                                }
-                                color_dict["sizes"].append(size_dict)
-                            product["colors"].append(color_dict)
-
-                except json.JSONDecodeError as e:
-                    print("Failed to parse JSON:", e)
-            else:
-                print("window.zara.viewPayload object not found")
-    else:
-        print("No matching script tag found")
-
-    for color in product["colors"]:
-        color_name = color["name"]
-        if color_name in links:
-            color["image"] = links[color_name]["image"]
-            color["url"] = links[color_name]["url"]
-
-    final_product = json.dumps(product, indent=4, ensure_ascii=False)
-    print(final_product)
-
-    response = {
-        'statusCode': 200,
-        'body': json.dumps({'message': 'script executed', 'product': final_product}, indent=4, ensure_ascii=False)
-    }
+    if url is None:
+        return {
+            'statusCode': 400,
+            'body': json.dumps({'error': 'url parameter is required'})
+        }
 
-    return response
+    if params.get('html'):
+        return page_response(event, url)
+    return product_response(url)
@@ -0,0 +1,465 @@
+from datetime import datetime
+import requests
+import json
+import os
+import sys
+import threading
+import atexit
+from urllib.parse import urljoin
+import time
+from worker import run_worker, write_result, write_stream
+from protocol import scrape, result_record, failure_record, FAILED
+from batch import run_batch, host_of
+from clearanceCache import ClearanceCache
+from sessionPool import session_pool
+from productModel import to_json
+from pageCache import PageCache, UNCHANGED, validator_headers
+from resultCache import ResultCache
+from historyStore import history_store, HISTORY
+from challengeSolver import scan
+from parsePipeline import ParsePool, parse_product_page, PARSE_PROCESSES
+from snapshotStore import SnapshotStore
+from categoryCrawler import crawl_category
+from proxyPool import ProxyPool
+from retryPolicy import Deadline, DeadlineExceeded, ChallengeFailed, ScrapeError, run_with_retry, classify, NETWORK, BLOCK, GET_TIMEOUT, VERIFY_TIMEOUT
+from tracing import current_trace, traced, NULL_TRACE
+from rateLimiter import rate_limiter, classify_status, CHALLENGE, THROTTLED, ERROR
+
+# The Zara scraping engine: one fetch/parse pipeline shared by every entry point
+# (zara.py, zaraLocal.py, zara-lambda.py, zara3.py). What differs between them is
+# only how a page is fetched, which is the transport:
+#
+#   DirectTransport     straight from this host
+#   ProxyPoolTransport  through the health-scored proxy pool
+#   LambdaTransport     through the zara-lambda.py function, which fetches the page
+#                       (challenge included) and returns the HTML for parsing here
+#
+# SCRAPER_TRANSPORT (direct, proxy or lambda) overrides a script's default.
+
+TRANSPORT = os.environ.get("SCRAPER_TRANSPORT")
+LAMBDA_URL = os.environ.get("SCRAPER_LAMBDA_URL")
+
+SITE = 'https://www.zara.com'
+# the verify endpoint lives on the origin that served the challenge
+SEC_PATH = '/_sec/verify?provider=interstitial'
+
+HEADERS = {
+    'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,image/apng,*/*;q=0.8',
+    'Accept-Language': 'en-US,en;q=0.6',
+    'Cache-Control': 'max-age=0',
+    'Referer': 'https://www.zara.com/ar/',
+    'Sec-CH-UA': '"Brave";v="123", "Not:A-Brand";v="8", "Chromium";v="123"',
+    'Sec-CH-UA-Mobile': '?0',
+    'Sec-CH-UA-Platform': '"Linux"',
+    'Sec-Fetch-Dest': 'document',
+    'Sec-Fetch-Mode': 'navigate',
+    'Sec-Fetch-Site': 'same-origin',
+    'Sec-Fetch-User': '?1',
+    'Sec-GPC': '1',
+    'Upgrade-Insecure-Requests': '1',
+    'User-Agent': 'Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/123.0.0.0 Safari/537.36'
+}
+
+# validators a page fetched through the Lambda transport carries back
+PASSED_HEADERS = ('ETag', 'Last-Modified')
+
+# Kept at module level so a resident worker reuses them between jobs
+clearance_cache = ClearanceCache()
+page_cache = PageCache()
+snapshot_store = SnapshotStore()
+result_cache = ResultCache()
+
+USAGE = "Usage: python file.py <URL> [--cache-key <key> [--if-changed]] [--delta] [--ndjson] | --worker | --batch <URL> [<URL> ...] [--ndjson] | --category <URL> [--details] [--ndjson]"
+
+
+def wait_for_token(limit_key, deadline):
+    # seconds waited for the request's rate limit token; a token that would
+    # only come after the deadline is not taken
+    waited = rate_limiter.acquire(limit_key, max(deadline.remaining(), 0))
+    if waited is None:
+        raise DeadlineExceeded("rate limit")
+    return waited
+
+
+class DirectTransport:
+    name = "direct"
+
+    def acquire(self, exclude=()):
+        # the route a request goes out through, None is this host
+        return None
+
+    def record_success(self, route, latency, challenged=False):
+        pass
+
+    def record_failure(self, route, latency=None):
+        pass
+
+    def record_error(self, route, error, latency=None):
+        # Network errors, 403/429 and 5xx count against the route. Any other
+        # status, like the 404/410 of a product that is gone, is an answer the
+        # route delivered
+        if classify(error) in (NETWORK, BLOCK):
+            self.record_failure(route, latency)
+        elif latency is not None:
+            self.record_success(route, latency)
+
+    def metrics(self):
+        return {}
+
+    def fetch(self, url, route=None, conditional=None, deadline=None):
+        deadline = deadline or Deadline()
+        key = route or "direct"
+        session = session_pool.get(route)
+        proxies = {"http": route, "https": route} if route else None
+        clearance = clearance_cache.get(key)
+        headers = {**HEADERS, **conditional} if conditional else HEADERS
+
+        trace = current_trace()
+        trace.set("proxy", key)
+        trace.set("clearanceReused", bool(clearance))
+        limit_key = (host_of(url), key)
+        trace.add("rateLimit", wait_for_token(limit_key, deadline))
+        start = time.monotonic()
+        try:
+            with trace.phase("initialGet"):
+                r = session.get(url, proxies=proxies, cookies=clearance, headers=headers, timeout=deadline.timeout("initial GET", GET_TIMEOUT))
+            trace.add("initialGetTtfb", r.elapsed.total_seconds())
+            trace.count("bytes", len(r.content))
+            r.raise_for_status()
+        except requests.RequestException as e:
+            self.record_error(route, e, time.monotonic() - start)
+            status = getattr(e.response, "status_code", None)
+            rate_limiter.record(limit_key, classify_status(status) if status else ERROR)
+            raise
+        latency = time.monotonic() - start
+        challenge = scan(r.content)
+        challenged = challenge is not None
+        trace.set("challenged", challenged)
+        trace.set("challengeSolved", False)
+        self.record_success(route, latency, challenged=challenged)
+        rate_limiter.record(limit_key, CHALLENGE if challenged else classify_status(r.status_code))
+
+        if not challenged:
+            # cached clearance was accepted, this is already the product page
+            return r
+
+        if clearance:
+            # challenged again, the cached clearance is no longer honoured
+            clearance_cache.invalidate(key)
+            session.cookies.clear()
+        payload = challenge.payload()
+        try:
+            with trace.phase("verifyPost"):
+                rr = session.post(urljoin(url, SEC_PATH), proxies=proxies, cookies=r.cookies, json=payload, headers=HEADERS, timeout=deadline.timeout("verify POST", VERIFY_TIMEOUT))
+            rr.raise_for_status()
+            clearance_cache.put(key, r.cookies, rr.cookies)
+            trace.add("rateLimit", wait_for_token(limit_key, deadline))
+            with trace.phase("finalGet"):
+                rrr = session.get(url, proxies=proxies, cookies=rr.cookies, headers=headers, timeout=deadline.timeout("final GET", GET_TIMEOUT))
+            trace.count("bytes", len(rrr.content))
+            rrr.raise_for_status()
+        except requests.RequestException as e:
+            self.record_error(route, e)
+            status = getattr(e.response, "status_code", None)
+            rate_limiter.record(limit_key, classify_status(status) if status else ERROR)
+            raise
+        if scan(rrr.content) is not None:
+            # verified and still challenged: this route is blocked
+            clearance_cache.invalidate(key)
+            rate_limiter.record(limit_key, THROTTLED)
+            raise ChallengeFailed(url)
+        trace.set("challengeSolved", True)
+        return rrr
+
+
+class ProxyPoolTransport(DirectTransport):
+    name = "proxy"
+
+    def __init__(self, proxy_pool=None):
+        self.proxy_pool = proxy_pool or ProxyPool.from_config()
+
+    def acquire(self, exclude=()):
+        return self.proxy_pool.acquire(exclude=exclude)
+
+    def record_success(self, route, latency, challenged=False):
+        self.proxy_pool.record_success(route, latency, challenged=challenged)
+
+    def record_failure(self, route, latency=None):
+        self.proxy_pool.record_failure(route, latency)
+
+    def metrics(self):
+        return self.proxy_pool.metrics()
+
+
+class LambdaTransport(DirectTransport):
+    name = "lambda"
+
+    def __init__(self, function_url=None):
+        self.function_url = function_url or LAMBDA_URL
+        if not self.function_url:
+            raise ValueError("No Lambda function URL configured, set SCRAPER_LAMBDA_URL")
+
+    def fetch(self, url, route=None, conditional=None, deadline=None):
+        # the function solves the challenge from its own IP and hands back the
+        # final page (or a 304 for the conditional headers forwarded with it)
+        deadline = deadline or Deadline()
+        trace = current_trace()
+        trace.set("proxy", self.name)
+        with trace.phase("lambdaGet"):
+            r = session_pool.get().get(self.function_url, params={'url': url, 'html': '1'}, headers=conditional,
+                                       timeout=deadline.timeout("Lambda GET", GET_TIMEOUT + VERIFY_TIMEOUT + GET_TIMEOUT))
+        trace.count("bytes", len(r.content))
+        r.raise_for_status()
+        return r
+
+
+def transport_from_config(default):
+    name = TRANSPORT or default
+    if name == "direct":
+        return DirectTransport()
+    if name == "proxy":
+        return ProxyPoolTransport()
+    if name == "lambda":
+        return LambdaTransport()
+    raise ValueError(f"Unknown SCRAPER_TRANSPORT {name!r}, expected direct, proxy or lambda")
+
+
+class ZaraEngine:
+    def __init__(self, transport, results=None):
+        self.transport = transport
+        self.results = results or result_cache
+        # bound here so every call, whichever entry point made it, gets a trace
+        self.extract_product_info = traced(self.extract_product_info)
+        self.parse_pool = None
+        self.parse_pool_lock = threading.Lock()
+
+    def start_parse_pool(self):
+        # batch, category and worker runs parse on the parser processes; a
+        # single scrape stays inline rather than pay for starting them
+        with self.parse_pool_lock:
+            if self.parse_pool is None and PARSE_PROCESSES > 0:
+                self.parse_pool = ParsePool()
+                atexit.register(self.close)
+
+    def parse(self, html, created, with_digest, stored_digest=None):
+        # Returns (product, digest), or UNCHANGED when the payload digest is
+        # `stored_digest`. On the pool the fetching thread hands the page to a
+        # parser process and waits, so the other fetchers keep the network busy
+        # while every core parses; the child's trace laps come back with the
+        # result and the rest of the wait is traced as parseHandoff.
+        if self.parse_pool is None:
+            unchanged = (lambda digest: digest == stored_digest) if stored_digest else None
+            return parse_product_page(html, created, with_digest, unchanged)
+        trace = current_trace()
+        start = time.perf_counter()
+        future = self.parse_pool.submit(html, created, with_digest, stored_digest, trace is not NULL_TRACE)
+        result, phases, counters = future.result()
+        trace.merge(phases, counters)
+        trace.add("parseHandoff", time.perf_counter() - start - sum(phases.values()) / 1000)
+        trace.lap()
+        # UNCHANGED comes back as an equal copy
+        return UNCHANGED if result == UNCHANGED else result
+
+    def close(self):
+        if self.parse_pool is not None:
+            self.parse_pool.close()
+            self.parse_pool = None
+
+    def fetch_product_page(self, url, route=None, conditional=None, deadline=None):
+        return self.transport.fetch(url, route, conditional, deadline)
+
+    def finish(self, url, product, digest, validators, cache_key, delta, known_digest):
+        # the per-consumer part of a scrape: page cache entry and delta
+        trace = current_trace()
+        if cache_key is not None:
+            page_cache.store(cache_key, url, validators, digest)
+            trace.lap("cache")
+        if delta:
+            with trace.phase("delta"):
+                return snapshot_store.delta(cache_key or url, product.to_dict(), known_digest)
+        return product
+
+    def revalidated(self, stale, response, created):
+        # the shared result behind a 304 or an unchanged digest, observed again
+        product, digest, validators = stale
+        validators = {**validators, **{name: response.headers[name] for name in PASSED_HEADERS if name in response.headers}}
+        return product.restamped(created), digest, validators
+
+    def extract_product_info(self, url, cache_key=None, if_changed=False, delta=False, known_digest=None, raise_errors=False):
+        try:
+            if url is None:
+                return {
+                    'statusCode': 400,
+                    'body': json.dumps({'error': 'url parameter is required in request body'})
+                }
+
+            current_utc_datetime = datetime.utcnow().isoformat()
+
+            tried = set()
+            # With the result cache on, the conditional request and the digest
+            # check revalidate the shared result, not this consumer's last one;
+            # each consumer's unchanged check then runs on the shared result
+            shared = self.results.enabled
+
+            def attempt(number, deadline, stale=None):
+                trace = current_trace()
+                trace.set("attempts", number + 1)
+                trace.lap()
+                # a retry goes out through a route this scrape has not used yet
+                route = self.transport.acquire(exclude=tried)
+                tried.add(route)
+                trace.lap("proxy")
+                if shared:
+                    conditional = validator_headers(stale[2]) if stale else None
+                    stored_digest = stale[1] if stale else None
+                else:
+                    conditional = page_cache.conditional_headers(cache_key, url) if if_changed else None
+                    stored_digest = page_cache.fresh_digest(cache_key, url) if if_changed else None
+                trace.lap("cache")
+                response = self.fetch_product_page(url, route, conditional, deadline)
+                if response.status_code == 304:
+                    trace.set("unchanged", "304")
+                    return self.revalidated(stale, response, current_utc_datetime) if shared else UNCHANGED
+                trace.lap()
+                product = self.parse(response.content, current_utc_datetime, cache_key is not None or shared, stored_digest)
+                if product is UNCHANGED:
+                    return self.revalidated(stale, response, current_utc_datetime) if shared else UNCHANGED
+                product, digest = product
+                if HISTORY:
+                    with trace.phase("history"):
+                        history_store.record(url, product.to_dict())
+                validators = {name: response.headers[name] for name in PASSED_HEADERS if name in response.headers}
+                if shared:
+                    return product, digest, validators
+                return self.finish(url, product, digest, validators, cache_key, delta, known_digest)
+
+            if not shared:
+                return run_with_retry(attempt)
+            # one deadline covers waiting for another scrape of the URL and the fetch
+            deadline = Deadline()
+            product, digest, validators = self.results.get_or_fetch(
+                url, lambda stale: run_with_retry(lambda number, deadline: attempt(number, deadline, stale), deadline),
+                deadline)
+            if if_changed and page_cache.is_unchanged(cache_key, url, digest):
+                current_trace().set("unchanged", "digest")
+                return UNCHANGED
+            return self.finish(url, product, digest, validators, cache_key, delta, known_digest)
+
+        except (ScrapeError, requests.RequestException, ValueError, json.JSONDecodeError, KeyError) as e:
+            current_trace().set("error", classify(e))
+            if raise_errors:
+                # the NDJSON protocol turns it into a status code
+                raise
+            # stderr keeps the stdout data channel clean for worker mode
+            print(f"Error occurred: {e}", file=sys.stderr)
+            return None
+
+    def extract_products(self, urls, max_workers=None, per_host=None):
+        self.start_parse_pool()
+        return run_batch(urls, self.extract_product_info, max_workers, per_host)
+
+    def fetch_listing_page(self, page_url):
+        # retried and deadline-bound like a product scrape; raises ScrapeError
+        tried = set()
+
+        def attempt(number, deadline):
+            route = self.transport.acquire(exclude=tried)
+            tried.add(route)
+            return self.fetch_product_page(page_url, route, deadline=deadline).content
+
+        return run_with_retry(attempt)
+
+    def crawl(self, url, details=False, max_pages=None):
+        products = crawl_category(url, self.fetch_listing_page, self.extract_products if details else None, max_pages)
+        if not HISTORY:
+            return products
+        return self.record_listing(products)
+
+    def crawl_records(self, url, products):
+        # protocol records of a crawl; a listing page that cannot be fetched ends
+        # it with an error record, so the stream still gets its end frame
+        try:
+            for product in products:
+                # listing entries are dicts, detail scrapes Products
+                product_url = product["url"] if isinstance(product, dict) else product.url
+                yield result_record(None, product_url, product)
+        except Exception as e:
+            yield failure_record(None, url, e)
+
+    def record_listing(self, products):
+        # listing entries go into the history too; detail scrapes recorded themselves
+        for product in products:
+            if isinstance(product, dict) and product["url"]:
+                history_store.record(product["url"], product)
+            yield product
+
+    def main(self, argv):
+        try:
+            return self.run(argv)
+        finally:
+            self.close()
+
+    def run(self, argv):
+        if len(argv) == 1 and argv[0] == "--worker":
+            # one job at a time: nothing to parse in parallel, so no parse pool
+            run_worker(self.extract_product_info, metrics=self.transport.metrics)
+            return 0
+
+        args = list(argv)
+        ndjson = "--ndjson" in args
+        if ndjson:
+            args.remove("--ndjson")
+
+        if len(args) > 1 and args[0] == "--batch":
+            if ndjson:
+                self.start_parse_pool()
+                results = run_batch(args[1:], lambda url: scrape(self.extract_product_info, url))
+                write_stream(sys.stdout, (record for _, record in results))
+                return 0
+            for url, product_info in self.extract_products(args[1:]):
+                if product_info:
+                    write_result(sys.stdout, {"url": url, "ok": True, "product": product_info})
+                else:
+                    write_result(sys.stdout, {"url": url, "ok": False, "error": FAILED})
+            return 0
+
+        if len(args) > 1 and args[0] == "--category":
+            products = self.crawl(args[1], details="--details" in args[2:])
+            if ndjson:
+                write_stream(sys.stdout, self.crawl_records(args[1], products))
+                return 0
+            try:
+                for product in products:
+                    write_result(sys.stdout, product)
+            except Exception as e:
+                print(f"Error occurred: {e}", file=sys.stderr)
+                return 1
+            return 0
+
+        if_changed = "--if-changed" in args
+        if if_changed:
+            args.remove("--if-changed")
+        delta = "--delta" in args
+        if delta:
+            args.remove("--delta")
+        cache_key = None
+        if len(args) == 3 and args[1] == "--cache-key":
+            cache_key = args.pop()
+            args.pop()
+
+        if len(args) != 1 or (if_changed and cache_key is None):
+            print(USAGE, file=sys.stderr)
+            return 1
+
+        url = args[0]
+        if ndjson:
+            record = scrape(self.extract_product_info, url, cache_key=cache_key, if_changed=if_changed, delta=delta)
+            write_stream(sys.stdout, [record])
+            return 0
+
+        product_info = self.extract_product_info(url, cache_key, if_changed, delta)
+        if product_info:
+            print(json.dumps(product_info, ensure_ascii=False, default=to_json))
+        else:
+            print(FAILED)
+        return 0
@@ -1,47 +1,149 @@
-import time
-from selenium import webdriver
-from selenium.webdriver.chrome.options import Options
-from selenium.webdriver.chrome.service import Service
+import requests
+from selenium.common.exceptions import WebDriverException
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 import json
 import sys
-import os
 from datetime import datetime
+from driverPool import driver_pool
+from worker import run_worker, write_result, write_stream
+from protocol import scrape
+from batch import run_batch
+from sessionPool import session_pool
+from pageParser import find_element_text, find_ld_json
 
-chrome_options = Options()
+PRICE_CLASS = "andes-money-amount__fraction"
+TITLE_CLASS = "ui-pdp-title"
+PRICE_LOCATOR = (By.CLASS_NAME, PRICE_CLASS)
+TITLE_LOCATOR = (By.CLASS_NAME, TITLE_CLASS)
 
-chrome_options.add_argument("--headless")
-chrome_options.add_argument("--no-sandbox")
-chrome_options.add_argument("--disable-dev-shm-usage")
+HEADERS = {
+    'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,*/*;q=0.8',
+    'Accept-Language': 'es-AR,es;q=0.9,en;q=0.6',
+    'User-Agent': 'Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/123.0.0.0 Safari/537.36'
+}
 
-service = Service(executable_path="/usr/local/bin/chromedriver/chromedriver")
-driver = webdriver.Chrome(service=service, options=chrome_options)
 
-url = sys.argv[1]
+def format_price(price):
+    # JSON-LD prices are numbers, the page shows the integer part as "12.345"
+    return f"{int(float(price)):,}".replace(",", ".")
 
-driver.get(url)
 
-WebDriverWait(driver, 5).until(
-    EC.presence_of_element_located((By.CLASS_NAME, "andes-money-amount__fraction"))
-)
+def ld_json_product(html):
+    for item in find_ld_json(html):
+        if item.get("@type") != "Product":
+            continue
+        offers = item.get("offers") or {}
+        if isinstance(offers, list):
+            offers = offers[0] if offers else {}
+        price = offers.get("price", offers.get("lowPrice"))
+        if item.get("name") and price is not None:
+            return item["name"], format_price(price)
+    return None, None
 
-price_element = driver.find_element(By.CLASS_NAME, "andes-money-amount__fraction")
-title_element = driver.find_element(By.CLASS_NAME, "ui-pdp-title")
 
-time.sleep(5)
+def extract_static_product(url):
+    # Most item pages are server rendered, so one GET is usually enough
+    r = session_pool.get().get(url, headers=HEADERS, timeout=10)
+    r.raise_for_status()
+    html = r.content
 
-file_name = os.path.basename(__file__)
-current_utc_datetime = datetime.utcnow().isoformat()
+    title = find_element_text(html, TITLE_CLASS)
+    price = find_element_text(html, PRICE_CLASS)
+    if not (title and price):
+        title, price = ld_json_product(html)
+    if not (title and price):
+        return None
 
-data = {
-    "name": title_element.text,
-    "url": url,
-    "price": price_element.text,
-    "created": current_utc_datetime
-}
+    return {
+        "name": title,
+        "url": url,
+        "price": price,
+        "created": datetime.utcnow().isoformat()
+    }
+
+
+def extract_browser_product(url, raise_errors=False):
+    try:
+        with driver_pool.acquire() as driver:
+            driver.get(url)
+
+            # ready as soon as both values are rendered, no fixed sleep
+            WebDriverWait(driver, 10).until(
+                EC.all_of(
+                    EC.presence_of_element_located(PRICE_LOCATOR),
+                    EC.presence_of_element_located(TITLE_LOCATOR)
+                )
+            )
+
+            price_element = driver.find_element(*PRICE_LOCATOR)
+            title_element = driver.find_element(*TITLE_LOCATOR)
+
+            current_utc_datetime = datetime.utcnow().isoformat()
+
+            return {
+                "name": title_element.text,
+                "url": url,
+                "price": price_element.text,
+                "created": current_utc_datetime
+            }
+
+    except WebDriverException as e:
+        if raise_errors:
+            raise
+        print(f"Error occurred: {e}", file=sys.stderr)
+        return None
+
+
+def extract_product_info(url, raise_errors=False):
+    try:
+        product = extract_static_product(url)
+        if product:
+            return product
+    except (requests.RequestException, ValueError) as e:
+        print(f"Static extraction failed, using the browser: {e}", file=sys.stderr)
+
+    return extract_browser_product(url, raise_errors)
+
+
+def extract_products(urls, max_workers=None, per_host=None):
+    return run_batch(urls, extract_product_info, max_workers, per_host)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) == 2 and sys.argv[1] == "--worker":
+        run_worker(extract_product_info)
+        sys.exit(0)
+
+    args = sys.argv[1:]
+    ndjson = "--ndjson" in args
+    if ndjson:
+        args.remove("--ndjson")
+
+    if len(args) > 1 and args[0] == "--batch":
+        if ndjson:
+            results = run_batch(args[1:], lambda url: scrape(extract_product_info, url))
+            write_stream(sys.stdout, (record for _, record in results))
+            sys.exit(0)
+        for url, product_info in extract_products(args[1:]):
+            if product_info:
+                write_result(sys.stdout, {"url": url, "ok": True, "product": product_info})
+            else:
+                write_result(sys.stdout, {"url": url, "ok": False, "error": "Failed to extract product information."})
+        sys.exit(0)
+
+    if len(args) != 1:
+        print("Usage: python file.py <URL> [--ndjson] | --worker | --batch <URL> [<URL> ...] [--ndjson]", file=sys.stderr)
+        sys.exit(1)
 
-print(json.dumps(data))
+    url = args[0]
+    if ndjson:
+        write_stream(sys.stdout, [scrape(extract_product_info, url)])
+        sys.exit(0)
 
-driver.quit()
\ No newline at end of file
+    product_info = extract_product_info(url)
+    if product_info:
+        print(json.dumps(product_info))
+    else:
+        print("Failed to extract product information.")
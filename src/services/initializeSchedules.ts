@@ -32,6 +32,23 @@ interface ScheduledTaskEntry {
 
 let cronJobs: { [key: string]: ScheduledTask } = {};
 
+// Schedules created with the same cron expression would otherwise all hit Zara
+// in the same second. Each schedule gets a fixed offset within the window,
+// derived from its uuid, so its own runs stay evenly spaced.
+const scheduleJitterMs =
+  Number(process.env.SCHEDULE_JITTER_SECONDS ?? "45") * 1000;
+
+const jitterFor = (uuid: string): number => {
+  let hash = 0;
+  for (let i = 0; i < uuid.length; i++) {
+    hash = (hash * 31 + uuid.charCodeAt(i)) >>> 0;
+  }
+  return scheduleJitterMs > 0 ? hash % scheduleJitterMs : 0;
+};
+
+const sleep = (ms: number): Promise<void> =>
+  new Promise((resolve) => setTimeout(resolve, ms));
+
 const scheduleRepo = new SupabaseScheduleRepoImpl();
 const zaraProductRepo = new SupabaseZaraProductRepoImpl();
 const zaraProductController = new ZaraProductControllerImpl(zaraProductRepo);
@@ -108,8 +125,14 @@ const createOrUpdateCronJob = (schedule: ScheduledTaskEntry): void => {
         cronJobs[uuid].stop();
       }
 
-      cronJobs[uuid] = cron.schedule(cron_expression, async () => {
+      const jitter = jitterFor(uuid);
+      const task = cron.schedule(cron_expression, async () => {
         try {
+          await sleep(jitter);
+          if (cronJobs[uuid] !== task) {
+            // replaced, paused or deleted while waiting
+            return;
+          }
           await zaraProductController.run(scrapingScript, user_id, uuid, url);
           await scheduleRepo.updateLastRun(uuid);
         } catch (error) {
@@ -118,6 +141,7 @@ const createOrUpdateCronJob = (schedule: ScheduledTaskEntry): void => {
           deleteCronJob(uuid);
         }
       });
+      cronJobs[uuid] = task;
     } else {
       deleteCronJob(uuid);
     }